@@ -0,0 +1,42 @@
+import os
+import threading
+import contextlib
+
+# Crash-safe file writes. Data goes to a temp file in the target's folder, which is then
+# renamed over the target, so readers (and the next run after a crash or Ctrl-C) see
+# either the old file or the new one, never a truncated one.
+
+TEMP_SUFFIX = '.tmp'
+
+
+def temp_path_for(path):
+    """A temp path next to path, unique per process and thread so concurrent writers never collide"""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f'.{name}.{os.getpid()}-{threading.get_ident()}{TEMP_SUFFIX}')
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', encoding='utf-8', newline=None):
+    """Open a temp file for writing and move it into place at path when the block succeeds"""
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, mode, encoding=None if 'b' in mode else encoding, newline=newline) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def remove_stale_temp_files(folder):
+    """Delete temp files left behind by writes that a crash interrupted; returns how many were removed"""
+    removed = 0
+    if not os.path.isdir(folder):
+        return removed
+    for entry in os.scandir(folder):
+        if entry.name.startswith('.') and entry.name.endswith(TEMP_SUFFIX) and entry.is_file():
+            with contextlib.suppress(OSError):
+                os.remove(entry.path)
+                removed += 1
+    return removed
@@ -0,0 +1,421 @@
+import os
+import re
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Offline benchmark: generates a synthetic corpus of resume PDFs, starts a local mock
+# chat-completions server and runs the full resume_scorer.main flow against it, so
+# throughput regressions in extraction, scoring or aggregation show up as numbers
+# without touching the real API.
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+               'Priya', 'Wei', 'Fatima', 'Mateo', 'Olga', 'Kwame', 'Yuki', 'Lars', 'Aisha', 'Diego']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Patel', 'Kim', 'Silva', 'Jensen', 'Haddad',
+              'Moreau', 'Ivanova', 'Tanaka', 'Mensah', 'Rossi', 'Kowalski', 'Nguyen', 'Lopez', 'Berg', 'Khan']
+SKILLS = ['Python', 'Django', 'Flask', 'FastAPI', 'PostgreSQL', 'Redis', 'Docker', 'Kubernetes', 'AWS', 'GCP',
+          'Terraform', 'React', 'TypeScript', 'Go', 'Rust', 'Java', 'Spark', 'Airflow', 'Kafka', 'CI/CD',
+          'pandas', 'NumPy', 'scikit-learn', 'PyTorch', 'GraphQL', 'REST APIs', 'Linux', 'Git', 'SQL', 'Celery']
+VERBS = ['Built', 'Designed', 'Led', 'Migrated', 'Optimized', 'Maintained', 'Automated', 'Scaled', 'Shipped', 'Refactored']
+OBJECTS = ['a payments service', 'the data pipeline', 'an internal API', 'the CI pipeline', 'a reporting dashboard',
+           'the search backend', 'a recommendation engine', 'the billing system', 'an ETL workflow', 'a mobile backend']
+
+JOB_DESCRIPTION = """Senior Python Developer
+
+We are looking for a backend engineer with strong Python experience (Django or FastAPI),
+PostgreSQL, Docker and AWS. Experience with Kafka, Airflow or Spark is a plus. You will
+design and maintain REST APIs, own CI/CD for your services and mentor junior developers.
+"""
+
+
+def pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one Helvetica text page per list of lines in pages"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_refs = []
+    for lines in pages:
+        content = 'BT /F1 10 Tf 50 760 Td 12 TL ' + ' '.join(f"({pdf_escape(line)}) '" for line in lines) + ' ET'
+        objects.append(f'<< /Length {len(content)} >>\nstream\n{content}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R '
+                       f'/Resources << /Font << /F1 3 0 R >> >> >>')
+        page_refs.append(f'{len(objects)} 0 R')
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref_offset = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    out += b''.join(f'{offset:010d} 00000 n \n'.encode('latin-1') for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode('latin-1')
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def synthetic_resume(rng, name, page_count, lines_per_page):
+    """Return the pages (lists of lines) of a made-up resume"""
+    skills = rng.sample(SKILLS, 8)
+    pages = []
+    for page in range(page_count):
+        lines = [name, f"{name.lower().replace(' ', '.')}@example.com | +1 555 {rng.randint(1000, 9999)}", '']
+        if page == 0:
+            lines += [f"Software engineer with {rng.randint(1, 15)} years of experience.", 'Skills: ' + ', '.join(skills), '']
+        while len(lines) < lines_per_page:
+            lines.append(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(skills)} and {rng.choice(skills)}")
+        lines.append(f'Page {page + 1} of {page_count}')
+        pages.append(lines)
+    return pages
+
+
+def generate_corpus(folder, count, pages=(1, 1), lines_per_page=40, seed=0, duplicate_rate=0.0):
+    """Write count synthetic resumes named <First>_<Last>_<n>_CV.pdf into folder.
+
+    A duplicate_rate fraction of them is sent twice: half as a byte-identical copy and
+    half with a changed phone number, both under a name like <first>-<last>-resume (<n>).pdf.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    total_bytes = 0
+    for number in range(count):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        path = os.path.join(folder, f"{name.replace(' ', '_')}_{number}_CV.pdf")
+        resume_pages = synthetic_resume(rng, name, rng.randint(*pages), lines_per_page)
+        write_pdf(path, resume_pages)
+        total_bytes += os.path.getsize(path)
+        if rng.random() < duplicate_rate:
+            copy_path = os.path.join(folder, f"{name.lower().replace(' ', '-')}-resume ({number}).pdf")
+            if rng.random() < 0.5:
+                shutil.copyfile(path, copy_path)
+            else:
+                edited = [list(lines) for lines in resume_pages]
+                edited[0][1] = edited[0][1].rsplit('+', 1)[0] + f'+1 555 {rng.randint(1000, 9999)}'
+                write_pdf(copy_path, edited)
+            total_bytes += os.path.getsize(copy_path)
+    return total_bytes
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Answers chat completion requests in the formats resume_scorer expects"""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        options = self.server.options
+        rng = random.Random()
+        time.sleep(max(0.0, options['latency'] + rng.uniform(-options['jitter'], options['jitter'])))
+
+        if not self.path.endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        roll = rng.random()
+        if roll < options['throttle_rate']:
+            self.send_json(429, {'error': {'message': 'Rate limit exceeded'}}, {'Retry-After': str(options['retry_after'])})
+            return
+        if roll < options['throttle_rate'] + options['error_rate']:
+            self.send_json(502, {'error': {'message': 'Upstream error'}})
+            return
+
+        parts = [part for message in request.get('messages', []) for part in message_parts(message)]
+        prompt = ''.join(parts)
+        # Like a provider's prompt cache: everything before the last part is reused once it has been seen
+        prefix = ''.join(parts[:-1])
+        with self.server.prefixes_lock:
+            cached_tokens = len(prefix) // 4 if prefix in self.server.prefixes else 0
+            self.server.prefixes.add(prefix)
+        malformed = rng.random() < options['malformed_rate']
+        answer = mock_answer(prompt, structured=request.get('response_format') is not None, malformed=malformed)
+        self.send_json(200, {
+            'id': 'mock-' + hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12],
+            'model': request.get('model', 'mock'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 20, 'total_tokens': len(prompt) // 4 + 20,
+                      'prompt_tokens_details': {'cached_tokens': cached_tokens}},
+        })
+
+
+def message_parts(message):
+    """The text of a chat message, as a list of its content parts"""
+    content = message.get('content')
+    if isinstance(content, str):
+        return [content]
+    return [part.get('text', '') for part in content or [] if isinstance(part, dict)]
+
+
+def mock_score(filename):
+    """Stable made-up score for a filename"""
+    return round(int(hashlib.sha256(filename.encode('utf-8')).hexdigest()[:8], 16) % 1000 / 10, 1)
+
+
+def mock_answer(prompt, structured=False, malformed=False):
+    """Reply like a model would: name,score,reason for one resume, JSON for a batch or in structured mode.
+
+    A malformed reply is prose that the scorer has to repair.
+    """
+    filenames = re.findall(r'^Filename: (.*)$', prompt, re.MULTILINE)
+    names = re.findall(r'^Probable name from filename: (.*)$', prompt, re.MULTILINE)
+    if not filenames:
+        # A request to reformat an earlier malformed reply
+        match = re.search(r'Candidate (.+?) gets a score of ([\d.]+)', prompt)
+        return json.dumps({'name': match.group(1), 'score': float(match.group(2)), 'reason': 'Relevant backend experience'} if match else {})
+    if malformed:
+        return f'Candidate {names[0].title()} gets a score of {mock_score(filenames[0])} for relevant backend experience.'
+    if '=== Resume ===' in prompt:
+        return json.dumps({
+            filename: {'name': name.title(), 'score': mock_score(filename), 'reason': 'Relevant backend experience'}
+            for filename, name in zip(filenames, names)
+        })
+    if structured:
+        return json.dumps({'name': names[0].title(), 'score': mock_score(filenames[0]), 'reason': 'Relevant backend experience'})
+    return f'{names[0].title()},{mock_score(filenames[0])},Relevant backend experience'
+
+
+def serve_mock(port, options, ready=None):
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockLLMHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 256
+    server.options = options
+    server.prefixes = set()
+    server.prefixes_lock = threading.Lock()
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_mock_server(options):
+    """Run the mock server in its own process so it doesn't compete with the scorer for the GIL"""
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    process = context.Process(target=serve_mock, args=(0, options, ready), daemon=True)
+    process.start()
+    port = ready.get(timeout=30)
+    return process, f'http://127.0.0.1:{port}/api/v1'
+
+
+def peak_rss_mb(who):
+    """Peak resident set size in MB of this process ('self') or its finished children ('children')"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def parse_range(value):
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark resume_scorer against a local mock LLM server.')
+    parser.add_argument('--resumes', type=int, default=200, help='Number of synthetic resumes to generate')
+    parser.add_argument('--pages', type=parse_range, default=(1, 2), help='Pages per resume, e.g. 2 or 1-3')
+    parser.add_argument('--lines-per-page', type=int, default=40, help='Text lines per page')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the corpus')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help='Fraction of resumes also sent as an exact or near-identical copy')
+    parser.add_argument('--latency', type=float, default=0.2, help='Mock API latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Random +/- added to the latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 502')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with a 429')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Fraction of replies in a format the scorer must repair')
+    parser.add_argument('--structured-output', action='store_true', help='Run the scorer in structured output mode')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='Retry-After seconds sent with a 429')
+    parser.add_argument('--batch-size', type=int, help='BATCH_SIZE for the run')
+    parser.add_argument('--concurrency', type=int, help='CONCURRENCY for the run')
+    parser.add_argument('--extract-workers', type=int, help='EXTRACT_WORKERS for the run')
+    parser.add_argument('--rate-limit', type=float, default=1000.0,
+                        help='RATE_LIMIT_RPS for the run (high by default so the mock latency is the limit)')
+    parser.add_argument('--response-cache', action='store_true', help='Keep the response cache on (off by default)')
+    parser.add_argument('--workdir', help='Run in this folder instead of a temporary one (kept afterwards)')
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help="Show resume_scorer's own output")
+    parser.add_argument('--serve-mock', action='store_true', help='Only run the mock server (for manual runs)')
+    parser.add_argument('--port', type=int, default=8765, help='Port for --serve-mock')
+    return parser.parse_args(argv)
+
+
+def run_benchmark(args):
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='resume_bench_')
+    resume_folder = os.path.join(workdir, 'resumes')
+    job_folder = os.path.join(workdir, 'job_descriptions')
+    result_folder = os.path.join(workdir, 'results')
+    os.makedirs(job_folder, exist_ok=True)
+    with open(os.path.join(job_folder, 'job_description.md'), 'w') as f:
+        f.write(JOB_DESCRIPTION)
+
+    started = time.monotonic()
+    corpus_bytes = generate_corpus(resume_folder, args.resumes, args.pages, args.lines_per_page, args.seed,
+                                   args.duplicate_rate)
+    corpus_seconds = time.monotonic() - started
+
+    options = {
+        'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+        'throttle_rate': args.throttle_rate, 'retry_after': args.retry_after, 'malformed_rate': args.malformed_rate,
+    }
+    server, base_url = start_mock_server(options)
+
+    os.environ.update({
+        'OPENROUTER_BASE_URL': base_url,
+        'OPENROUTER_API_KEY': 'benchmark',
+        'RESPONSE_CACHE': str(args.response_cache),
+        'RESPONSE_CACHE_PATH': os.path.join(workdir, '.cache', 'responses.sqlite3'),
+        'TEXT_CACHE_DIR': os.path.join(workdir, '.cache', 'text'),
+        'RATE_LIMIT_RPS': str(args.rate_limit),
+        'RATE_LIMIT_MAX_RPS': str(max(args.rate_limit, 50)),
+    })
+    if args.extract_workers:
+        os.environ['EXTRACT_WORKERS'] = str(args.extract_workers)
+    argv = ['--non-interactive', '--criteria', '', '--resume-folder', resume_folder,
+            '--job-desc-folder', job_folder, '--result-folder', result_folder]
+    if args.batch_size:
+        argv += ['--batch-size', str(args.batch_size)]
+    if args.concurrency:
+        argv += ['--concurrency', str(args.concurrency)]
+    if args.structured_output:
+        argv.append('--structured-output')
+
+    # resume_scorer creates its .env and cache folders relative to the working directory
+    previous_cwd = os.getcwd()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    output = sys.stdout if args.verbose else io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            import resume_scorer
+
+            started = time.monotonic()
+            summary = resume_scorer.main(argv)
+            cold_seconds = time.monotonic() - started
+            extract_rss = peak_rss_mb('children')
+
+            # Nothing changed, so this measures discovery and the skip path
+            started = time.monotonic()
+            resume_scorer.main(argv)
+            rerun_seconds = time.monotonic() - started
+
+            # Force a full rewrite of the final results
+            os.remove(os.path.join(result_folder, '_final_results.json'))
+            started = time.monotonic()
+            resume_scorer.aggregate_and_save_results(result_folder)
+            aggregate_seconds = time.monotonic() - started
+    finally:
+        os.chdir(previous_cwd)
+        server.terminate()
+        server.join()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summary or {'discovered': 0, 'processed': 0, 'failed': 0, 'duplicates': 0, 'stages': []}
+    return {
+        'config': {
+            'resumes': args.resumes, 'pages': list(args.pages), 'lines_per_page': args.lines_per_page,
+            'duplicate_rate': args.duplicate_rate,
+            'batch_size': resume_scorer.BATCH_SIZE, 'concurrency': resume_scorer.CONCURRENCY,
+            'extract_workers': resume_scorer.EXTRACT_WORKERS, 'response_cache': args.response_cache, **options,
+        },
+        'corpus_mb': round(corpus_bytes / (1024 * 1024), 2),
+        'corpus_seconds': round(corpus_seconds, 3),
+        'discovered': summary['discovered'],
+        'processed': summary['processed'],
+        'failed': summary['failed'],
+        'duplicates': summary['duplicates'],
+        'repairs': summary['report']['repairs'] if summary.get('report') else 0,
+        'prompt_tokens': summary['report']['prompt_tokens'] if summary.get('report') else 0,
+        'cached_tokens': summary['report']['cached_tokens'] if summary.get('report') else 0,
+        'run_seconds': round(cold_seconds, 3),
+        'resumes_per_second': round(summary['processed'] / cold_seconds, 2) if cold_seconds > 0 else 0.0,
+        'rerun_seconds': round(rerun_seconds, 3),
+        'aggregate_seconds': round(aggregate_seconds, 3),
+        'stages': summary['stages'],
+        'peak_rss_mb': peak_rss_mb('self'),
+        'peak_extract_worker_rss_mb': extract_rss,
+    }
+
+
+def format_ms(value):
+    return f'{value:.1f}' if value is not None else '-'
+
+
+def format_report(report):
+    config = report['config']
+    lines = [
+        f"Corpus:      {config['resumes']} resumes, {config['pages'][0]}-{config['pages'][1]} pages, "
+        f"{report['corpus_mb']} MB (generated in {report['corpus_seconds']}s)",
+        f"Settings:    batch size {config['batch_size']}, concurrency {config['concurrency']}, "
+        f"{config['extract_workers']} extract workers, mock latency {config['latency']}s, "
+        f"error rate {config['error_rate']:.0%}, 429 rate {config['throttle_rate']:.0%}",
+        f"Scored:      {report['processed']} of {report['discovered']} ({report['failed']} failed, "
+        f"{report['duplicates']} duplicates) "
+        f"in {report['run_seconds']}s = {report['resumes_per_second']} resumes/sec, {report['repairs']:g} replies repaired",
+        f"Tokens:      {report['prompt_tokens']} prompt, {report['cached_tokens']} of them from the prompt cache "
+        f"({report['cached_tokens'] / report['prompt_tokens'] if report['prompt_tokens'] else 0:.0%})",
+        f"Rerun:       {report['rerun_seconds']}s (nothing changed)",
+        f"Aggregation: {report['aggregate_seconds']}s (full rewrite)",
+        f"Peak RSS:    {report['peak_rss_mb']} MB (scorer), {report['peak_extract_worker_rss_mb']} MB (largest extract worker)",
+        '',
+        f"{'stage':<10} {'workers':>7} {'done':>7} {'errors':>6} {'items/s':>8} {'busy':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+    ]
+    for s in report['stages']:
+        busy = f"{s['utilization']:.0%}" if s['utilization'] is not None else '-'
+        lines.append(f"{s['stage']:<10} {s['workers']:>7} {s['processed']:>7} {s['errors']:>6} {s['throughput']:>8.2f} "
+                     f"{busy:>6} {format_ms(s['p50_ms']):>8} {format_ms(s['p95_ms']):>8} {format_ms(s['p99_ms']):>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve_mock:
+        print(f"Mock chat completions API on http://127.0.0.1:{args.port}/api/v1 (Ctrl+C to stop)")
+        try:
+            serve_mock(args.port, {
+                'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+                'throttle_rate': args.throttle_rate, 'retry_after': args.retry_after, 'malformed_rate': args.malformed_rate,
+            })
+        except KeyboardInterrupt:
+            pass
+        return
+
+    report = run_benchmark(args)
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nReport saved to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
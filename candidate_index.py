@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# Persistent index of every scored candidate across all result folders (requisitions).
+# save_result writes to it, so tools like the interview generator can look candidates
+# up without opening every result file of every run.
+
+DEFAULT_INDEX_PATH = os.path.join('.cache', 'candidates.sqlite3')
+
+
+def requisition_name(result_folder):
+    """A result folder's requisition is its folder name, e.g. results_backend_dev or a job's subfolder"""
+    return os.path.basename(os.path.normpath(result_folder))
+
+
+class CandidateIndex:
+    """SQLite table of candidates with lookups by requisition, score range and name prefix"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS candidates (
+            result_file TEXT PRIMARY KEY,
+            requisition TEXT NOT NULL,
+            result_folder TEXT NOT NULL,
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            score REAL NOT NULL,
+            text_file TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )""")
+        self._conn.execute('CREATE INDEX IF NOT EXISTS candidates_requisition ON candidates (requisition, score DESC)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS candidates_name ON candidates (name_key)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS candidates_filename ON candidates (filename)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.getenv('CANDIDATE_INDEX_PATH', DEFAULT_INDEX_PATH))
+
+    def _row(self, result_folder, result_data):
+        result_key = os.path.splitext(result_data['original_filename'])[0]
+        return (
+            os.path.abspath(os.path.join(result_folder, f'{result_key}.json')),
+            requisition_name(result_folder),
+            os.path.abspath(result_folder),
+            result_data['name'],
+            result_data['name'].casefold(),
+            result_data['original_filename'],
+            result_data['score'],
+            os.path.abspath(os.path.join(result_folder, f"{result_data['original_filename']}.txt")),
+            time.time(),
+        )
+
+    def upsert(self, result_folder, result_data):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               self._row(result_folder, result_data))
+            self._conn.commit()
+
+    def is_backfilled(self):
+        with self._lock:
+            return self._conn.execute("SELECT value FROM meta WHERE key = 'backfilled'").fetchone() is not None
+
+    def backfill(self, result_folders):
+        """Index the per-resume JSON files of existing result folders (results from before the index existed)"""
+        rows = []
+        for folder in result_folders:
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                if not entry.name.endswith('.json') or entry.name.startswith('_'):
+                    continue
+                try:
+                    with open(entry.path, 'r') as f:
+                        result = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Error reading {entry.path}: {e}")
+                    continue
+                if isinstance(result, dict) and {'id', 'name', 'score', 'original_filename'} <= result.keys():
+                    rows.append(self._row(folder, result))
+
+        with self._lock:
+            self._conn.executemany('INSERT OR IGNORE INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', 1)")
+            self._conn.commit()
+        return len(rows)
+
+    def search(self, requisition=None, min_score=None, max_score=None, name_prefix=None, filename_prefix=None, limit=None):
+        """Return matching candidates as dicts, highest score first (name_prefix ignores case)"""
+        conditions = []
+        params = []
+        if requisition is not None:
+            conditions.append('requisition = ?')
+            params.append(requisition)
+        if min_score is not None:
+            conditions.append('score >= ?')
+            params.append(min_score)
+        if max_score is not None:
+            conditions.append('score <= ?')
+            params.append(max_score)
+        if name_prefix:
+            # Range scan instead of LIKE so the name index is used
+            conditions.append('name_key >= ? AND name_key < ?')
+            params += [name_prefix.casefold(), name_prefix.casefold() + '\U0010ffff']
+        if filename_prefix:
+            conditions.append('filename >= ? AND filename < ?')
+            params += [filename_prefix, filename_prefix + '\U0010ffff']
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT requisition, name, filename, score, result_file, text_file FROM candidates {where} '
+                f'ORDER BY score DESC LIMIT ?', params + [-1 if limit is None else limit]
+            ).fetchall()
+        return [
+            {'requisition': row[0], 'name': row[1], 'filename': row[2], 'score': row[3],
+             'result_file': row[4], 'resume_file': row[5]}
+            for row in rows
+        ]
+
+    def requisitions(self):
+        """Return (requisition, candidate count) pairs"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT requisition, COUNT(*) FROM candidates GROUP BY requisition ORDER BY requisition'
+            ).fetchall()
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_candidate_index():
+    """Return the process-wide candidate index"""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = CandidateIndex.from_env()
+        return _shared_index
@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import zlib
+import array
+import random
+import sqlite3
+import threading
+
+from atomic_io import atomic_write
+
+# Duplicate resume detection. Applicants often send the same CV several times under
+# different names; identical files are caught by their content hash and re-exported or
+# lightly edited copies by MinHash signatures of the extracted text, looked up through
+# LSH buckets. Only one resume per group is scored and the others get a copy of its score.
+
+DUPLICATE_REPORT_FILENAME = '_duplicate_groups.json'
+DEFAULT_SIGNATURE_PATH = os.path.join('.cache', 'signatures.sqlite3')
+DEFAULT_THRESHOLD = 0.9  # Estimated Jaccard similarity of word shingles to count as a duplicate
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16  # 16 bands of 8 rows: pairs above ~0.7 similarity almost always share a bucket
+ROWS = NUM_PERM // BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Fixed seed: signatures are stored and compared across runs and processes
+_rng = random.Random(0x5EED)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingle_hashes(text):
+    """32-bit hashes of the text's overlapping word 5-grams (case and punctuation ignored)"""
+    words = WORD_PATTERN.findall(text.casefold())
+    if len(words) <= SHINGLE_WORDS:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode('utf-8'))
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash_signature(text):
+    """Return the text's MinHash signature as an array of NUM_PERM integers, or None for empty text.
+
+    CPU-bound and free of shared state, so it can run in a worker process.
+    """
+    hashes = shingle_hashes(text)
+    if not hashes:
+        return None
+    return array.array('Q', (min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS))
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+class DuplicateIndex:
+    """Representative resumes of one result folder, looked up by content hash or MinHash LSH.
+
+    Not thread-safe; the pipeline's dedupe stage runs a single worker.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._by_hash = {}
+        self._hashes = {}  # filename -> content hash it represents
+        self._signatures = {}
+        self._buckets = {}  # (band, band values) -> filenames
+
+    def __len__(self):
+        return len(self._by_hash)
+
+    def _bands(self, signature):
+        return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def add(self, filename, content_hash, signature=None):
+        if self._by_hash.setdefault(content_hash, filename) == filename:
+            self._hashes[filename] = content_hash
+        if signature is not None:
+            self._signatures[filename] = signature
+            for key in self._bands(signature):
+                self._buckets.setdefault(key, set()).add(filename)
+
+    def remove(self, filename):
+        """Forget a representative, e.g. because it was edited and is being rescored"""
+        content_hash = self._hashes.pop(filename, None)
+        if content_hash is not None:
+            del self._by_hash[content_hash]
+        signature = self._signatures.pop(filename, None)
+        if signature is not None:
+            for key in self._bands(signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(filename)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def match(self, content_hash, signature=None):
+        """Return (representative, similarity, 'exact' or 'near') for a duplicate, or None"""
+        if content_hash in self._by_hash:
+            return self._by_hash[content_hash], 1.0, 'exact'
+        if signature is None:
+            return None
+        candidates = set()
+        for key in self._bands(signature):
+            candidates |= self._buckets.get(key, set())
+        best = max(((similarity(signature, self._signatures[filename]), filename) for filename in candidates), default=None)
+        if best is None or best[0] < self.threshold:
+            return None
+        return best[1], best[0], 'near'
+
+
+class SignatureStore:
+    """SQLite store of MinHash signatures keyed by PDF content hash, shared by every run"""
+
+    def __init__(self, path=DEFAULT_SIGNATURE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS signatures (content_hash TEXT PRIMARY KEY, signature BLOB NOT NULL)')
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.getenv('SIGNATURE_STORE_PATH', DEFAULT_SIGNATURE_PATH))
+
+    @staticmethod
+    def _decode(blob):
+        signature = array.array('Q')
+        signature.frombytes(blob)
+        return signature
+
+    def get(self, content_hash):
+        with self._lock:
+            row = self._conn.execute('SELECT signature FROM signatures WHERE content_hash = ?', (content_hash,)).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def get_many(self, content_hashes, chunk_size=500):
+        """Return {content_hash: signature} for the hashes that have a stored signature"""
+        content_hashes = list(content_hashes)
+        found = {}
+        with self._lock:
+            for start in range(0, len(content_hashes), chunk_size):
+                chunk = content_hashes[start:start + chunk_size]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, signature FROM signatures WHERE content_hash IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((content_hash, self._decode(blob)) for content_hash, blob in rows)
+        return found
+
+    def set(self, content_hash, signature):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO signatures (content_hash, signature) VALUES (?, ?)',
+                               (content_hash, signature.tobytes()))
+            self._conn.commit()
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_signature_store():
+    """Return the process-wide signature store"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = SignatureStore.from_env()
+        return _shared_store
+
+
+def duplicate_groups(results):
+    """Group ranked results by the representative whose score they were given"""
+    by_filename = {result['original_filename']: result for result in results}
+    groups = {}
+    for result in results:
+        # A resume is never a duplicate of itself (results saved by older versions could say so)
+        if result.get('duplicate_of') and result['duplicate_of'] != result['original_filename']:
+            groups.setdefault(result['duplicate_of'], []).append({
+                'original_filename': result['original_filename'],
+                'name': result['name'],
+                'match': result.get('duplicate_match'),
+                'similarity': result.get('duplicate_similarity'),
+            })
+    return [
+        {
+            'representative': representative,
+            'name': by_filename.get(representative, {}).get('name'),
+            'score': by_filename.get(representative, {}).get('score'),
+            'duplicates': sorted(duplicates, key=lambda d: d['original_filename']),
+        }
+        for representative, duplicates in sorted(groups.items())
+    ]
+
+
+def write_duplicate_report(results, result_folder):
+    """Write _duplicate_groups.json when the folder has duplicates (or had them in an earlier report)"""
+    path = os.path.join(result_folder, DUPLICATE_REPORT_FILENAME)
+    groups = duplicate_groups(results)
+    if not groups and not os.path.exists(path):
+        return None
+    with atomic_write(path) as f:
+        json.dump(groups, f, indent=4)
+    return groups
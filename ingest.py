@@ -0,0 +1,279 @@
+import os
+import io
+import json
+import zlib
+import hashlib
+import zipfile
+import argparse
+import posixpath
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+import PyPDF2
+
+from atomic_io import temp_path_for
+
+# Resume intake: walks folders and zip archives (nested too) in one streaming pass,
+# reading each zip member as it goes, validates the PDFs in a process pool and copies the good ones into the resume folder
+# under a unique name. Corrupt, encrypted and non-PDF files are rejected here, so they
+# never reach extraction. resume_scorer.py --ingest feeds the results straight into
+# the scoring pipeline instead of listing the resume folder afterwards.
+
+ZIP_MAX_DEPTH = 3  # Zips inside zips are followed this deep
+MAX_PDF_BYTES = 50 * 1024 * 1024  # Larger files (or zip members) are rejected rather than read into memory
+MAX_NAME_SUFFIX = 1000
+HEADER_SEARCH_BYTES = 1024  # PDF readers accept a %PDF- header anywhere in the first 1 KB
+
+
+class IngestedFile:
+    """Stands in for the os.DirEntry of an ingested resume (name, path and stat())"""
+
+    def __init__(self, path, stat_result):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = stat_result
+
+    def stat(self):
+        return self._stat
+
+
+def source_label(source):
+    """Readable name of a source: a path, or archive.zip!member.pdf for zip members"""
+    path, members = source
+    return '!'.join((path,) + members)
+
+
+def walk_sources(paths, counts=None):
+    """Yield (source, data, reason) for every PDF under paths, without listing everything first.
+
+    source is (path, zip member chain). Zip members are read in the same pass over their
+    archive, so data holds their bytes, or reason says why they couldn't be read; for
+    plain files both are None and the worker reads the file. counts, if given, is
+    updated with the number of 'skipped' non-PDF files.
+    """
+    counts = {} if counts is None else counts
+    stack = list(reversed(paths))
+    while stack:
+        path = stack.pop()
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                children = sorted(entry.path for entry in entries if not entry.name.startswith('.'))
+            stack.extend(reversed(children))
+        elif path.lower().endswith('.pdf'):
+            yield (path, ()), None, None
+        elif path.lower().endswith('.zip'):
+            yield from walk_zip(path, (), lambda: open(path, 'rb'), counts)
+        else:
+            counts['skipped'] = counts.get('skipped', 0) + 1
+
+
+def walk_zip(path, members, opener, counts, depth=1):
+    try:
+        with opener() as f, zipfile.ZipFile(f) as archive:
+            infos = [info for info in archive.infolist() if not info.is_dir()]
+            for info in sorted(infos, key=lambda info: info.filename):
+                name = info.filename.lower()
+                if name.endswith('.pdf'):
+                    yield (path, members + (info.filename,)), *read_member(archive, info)
+                elif name.endswith('.zip') and depth < ZIP_MAX_DEPTH and info.file_size <= MAX_PDF_BYTES:
+                    data = archive.read(info)
+                    yield from walk_zip(path, members + (info.filename,), lambda: io.BytesIO(data), counts, depth + 1)
+                else:
+                    counts['skipped'] = counts.get('skipped', 0) + 1
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Could not read archive {source_label((path, members))}: {e}")
+        counts['skipped'] = counts.get('skipped', 0) + 1
+
+
+def read_member(archive, info):
+    """Return (bytes, None) for a zip member, or (None, reason) if it is too large or can't be read"""
+    if info.file_size > MAX_PDF_BYTES:
+        return None, 'file too large'
+    try:
+        return archive.read(info), None
+    except (OSError, RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error) as e:
+        # Bad CRC, encrypted member or unsupported compression
+        return None, str(e)
+
+
+def read_file(path):
+    """Return the bytes of a file, or raise ValueError if it is too large"""
+    if os.path.getsize(path) > MAX_PDF_BYTES:
+        raise ValueError('file too large')
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def validate_pdf(data):
+    """Return None for a readable PDF, or the reason it can't be scored"""
+    if not data:
+        return 'empty file'
+    if b'%PDF-' not in data[:HEADER_SEARCH_BYTES]:
+        return 'not a PDF'
+    try:
+        reader = PyPDF2.PdfReader(io.BytesIO(data))
+        # Files with only an owner password were already opened with the empty password
+        if reader.is_encrypted and reader.decrypt('') == PyPDF2.PasswordType.NOT_DECRYPTED:
+            return 'encrypted'
+        if len(reader.pages) == 0:
+            return 'no pages'
+    except PyPDF2.errors.DependencyError:
+        return 'encrypted (AES needs pycryptodome)'
+    except Exception as e:
+        # PyPDF2 raises many different errors for damaged files
+        return f'corrupt PDF ({type(e).__name__}: {e})'
+    return None
+
+
+def target_names(filename):
+    """resume.pdf, resume (1).pdf, resume (2).pdf, ..."""
+    stem = os.path.splitext(filename)[0] or 'resume'
+    yield f'{stem}.pdf'
+    for number in range(1, MAX_NAME_SUFFIX):
+        yield f'{stem} ({number}).pdf'
+
+
+def publish(data, content_hash, resume_folder, filename):
+    """Place data in resume_folder under filename or the first free numbered variant.
+
+    Returns (path, True) if it was written or (path, False) if an identical file was
+    already there, so ingesting the same dump twice adds nothing. The file appears
+    complete or not at all: it is written to a temp file and then hard linked into
+    place, which fails instead of overwriting when another worker took the name first.
+    """
+    for name in target_names(filename):
+        target = os.path.join(resume_folder, name)
+        if os.path.exists(target):
+            if os.path.getsize(target) == len(data):
+                with open(target, 'rb') as f:
+                    if hashlib.sha256(f.read()).hexdigest() == content_hash:
+                        return target, False
+            continue
+        tmp_path = temp_path_for(target)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.link(tmp_path, target)
+            return target, True
+        except FileExistsError:
+            continue
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    raise OSError(f'no free name for {filename} in {resume_folder}')
+
+
+def ingest_file(source, resume_folder, move=False, data=None):
+    """Validate one PDF and copy it into resume_folder (runs in a worker process).
+
+    data holds the bytes of a zip member; plain files are read here. Returns a dict with
+    the source, its status ('new', 'unchanged' or 'rejected') and for accepted files the
+    resume path, content hash and os.stat result.
+    """
+    label = source_label(source)
+    path, members = source
+    if data is None:
+        try:
+            data = read_file(path)
+        except (OSError, ValueError) as e:
+            return {'source': label, 'status': 'rejected', 'reason': str(e)}
+    reason = validate_pdf(data)
+    if reason:
+        return {'source': label, 'status': 'rejected', 'reason': reason}
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    try:
+        filename = posixpath.basename(members[-1]) if members else os.path.basename(path)
+        target, written = publish(data, content_hash, resume_folder, filename)
+        if move and not members and not os.path.samefile(path, target):
+            os.remove(path)
+        target_stat = os.stat(target)
+    except OSError as e:
+        return {'source': label, 'status': 'rejected', 'reason': str(e)}
+    return {'source': label, 'status': 'new' if written else 'unchanged', 'path': target,
+            'sha256': content_hash, 'stat': target_stat}
+
+
+def ingest(paths, resume_folder, workers=None, move=False, counts=None):
+    """Yield ingest_file results for every PDF under paths as soon as each one is done.
+
+    At most a few files per worker are in flight (zip members with their bytes), so memory
+    stays flat however large the dump. counts, if given, is updated with the number of files
+    per status (plus 'skipped').
+    """
+    counts = {} if counts is None else counts
+    os.makedirs(resume_folder, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for source, data, reason in walk_sources(paths, counts):
+            if reason:
+                yield tally({'source': source_label(source), 'status': 'rejected', 'reason': reason}, counts)
+                continue
+            if len(in_flight) >= workers * 4:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from collect(done, counts)
+            in_flight.add(executor.submit(ingest_file, source, resume_folder, move, data))
+        yield from collect(wait(in_flight).done, counts)
+
+
+def collect(futures, counts):
+    for future in futures:
+        yield tally(future.result(), counts)
+
+
+def tally(result, counts):
+    counts[result['status']] = counts.get(result['status'], 0) + 1
+    return result
+
+
+def remove_empty_folders(paths):
+    """Delete folders left empty under paths (e.g. after --move), keeping paths themselves"""
+    for path in paths:
+        if not os.path.isdir(path):
+            continue
+        for folder, _, _ in os.walk(path, topdown=False):
+            if os.path.abspath(folder) != os.path.abspath(path) and not os.listdir(folder):
+                os.rmdir(folder)
+
+
+def format_counts(counts):
+    return (f"{counts.get('new', 0)} new, {counts.get('unchanged', 0)} already present, "
+            f"{counts.get('rejected', 0)} rejected, {counts.get('skipped', 0)} other files skipped")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Copy the resume PDFs found in folders and zip archives into the resume folder, '
+                    'rejecting corrupt and encrypted files. To score them in the same pass, use '
+                    'resume_scorer.py --ingest instead.')
+    parser.add_argument('sources', nargs='+', help='folders, PDFs or zip archives to take resumes from')
+    parser.add_argument('--resume-folder', default=os.getenv('RESUME_FOLDER', 'resumes'), help='where to put the resumes')
+    parser.add_argument('--workers', type=int, help='processes validating PDFs (default: CPU count)')
+    parser.add_argument('--move', action='store_true',
+                        help='delete source PDFs once they are in the resume folder, and then any folders left empty')
+    parser.add_argument('--report', help='write every file and its status to this JSON file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    counts = {}
+    results = []
+    for result in ingest(args.sources, args.resume_folder, args.workers, args.move, counts):
+        if result['status'] == 'rejected':
+            print(f"Rejected {result['source']}: {result['reason']}")
+        if args.report:
+            results.append({key: value for key, value in result.items() if key != 'stat'})
+    if args.move:
+        remove_empty_folders(args.sources)
+    print(f"Ingested into {args.resume_folder}: {format_counts(counts)}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Report saved to {args.report}")
+    return counts
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+import contextlib
+
+from atomic_io import atomic_write
+
+# Per-resume timing, retry, token and cost accounting for a scoring run. Each resume/job
+# pair gets a ResumeTrace; finished traces are appended to a JSONL trace (the only copy of the
+# per-resume detail) and rolled up into running totals for the run report (and optionally an
+# OpenMetrics file for monitoring).
+
+TRACE_FILENAME = '_trace.jsonl'
+REPORT_FILENAME = '_run_report.json'
+STAGES = ('extract', 'prompt', 'api', 'parse')
+
+# USD per million (prompt, completion, cached prompt) tokens, used when the API response carries
+# no cost. Override with PROMPT_PRICE_PER_MILLION / COMPLETION_PRICE_PER_MILLION /
+# CACHED_PROMPT_PRICE_PER_MILLION for other models.
+MODEL_PRICES = {
+    'openai/gpt-4o-mini': (0.15, 0.60, 0.075),
+    'openai/gpt-4o': (2.50, 10.00, 1.25),
+    'openai/gpt-4.1-mini': (0.40, 1.60, 0.10),
+    'openai/gpt-4.1': (2.00, 8.00, 0.50),
+    'anthropic/claude-3.5-haiku': (0.80, 4.00, 0.08),
+    'anthropic/claude-3.5-sonnet': (3.00, 15.00, 0.30),
+    'google/gemini-flash-1.5': (0.075, 0.30, 0.01875),
+}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of a request, or None when the model's prices are unknown.
+
+    cached_tokens is the part of prompt_tokens the provider served from its prompt cache.
+    """
+    prompt_price, completion_price, cached_price = MODEL_PRICES.get(model, (None, None, None))
+    prompt_price = float(os.getenv('PROMPT_PRICE_PER_MILLION', prompt_price if prompt_price is not None else -1))
+    completion_price = float(os.getenv('COMPLETION_PRICE_PER_MILLION', completion_price if completion_price is not None else -1))
+    if prompt_price < 0 or completion_price < 0:
+        return None
+    # Without a known discount, cached tokens are priced like any other prompt token
+    cached_price = float(os.getenv('CACHED_PROMPT_PRICE_PER_MILLION', cached_price if cached_price is not None else prompt_price))
+    return ((prompt_tokens - cached_tokens) * prompt_price + cached_tokens * cached_price
+            + completion_tokens * completion_price) / 1_000_000
+
+
+class ResumeTrace:
+    """Where the time, retries and tokens went for one resume (or one batch request)"""
+
+    def __init__(self, filename=None, job=None):
+        self.filename = filename
+        self.job = job
+        self.started = time.monotonic()
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0  # Prompt tokens served from the provider's prompt cache
+        self.cost = 0.0
+        self.cost_known = True
+        self.cached = False
+        self.batch_size = 1
+        self.model = None
+        self.compaction = None
+        self.repairs = 0
+
+    def add_time(self, stage, seconds):
+        self.seconds[stage] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.monotonic() - started)
+
+    def mark_cached(self):
+        """The response came from the response cache, so no tokens were spent"""
+        self.cached = True
+
+    def mark_repaired(self):
+        """A malformed reply had to be repaired or the resume rescored"""
+        self.repairs += 1
+
+    def add_compaction(self, stats):
+        """Record the resume text's token count before and after compaction (None if it was off)"""
+        self.compaction = stats
+
+    def add_response(self, response_json, model, attempts=1):
+        """Account for one API response: retries, token usage and cost"""
+        self.model = model
+        self.retries += max(0, attempts - 1)
+        usage = (response_json.get('usage') if isinstance(response_json, dict) else None) or {}
+        prompt_tokens = usage.get('prompt_tokens') or 0
+        completion_tokens = usage.get('completion_tokens') or 0
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        cost = usage.get('cost')
+        if cost is None:
+            cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        if cost is None:
+            self.cost_known = False
+        else:
+            self.cost += cost
+
+    def merge(self, other, share=1.0):
+        """Add a share of another trace, e.g. one resume's part of a batch request"""
+        for stage in STAGES:
+            self.seconds[stage] += other.seconds[stage] * share
+        self.retries += other.retries * share
+        self.repairs += other.repairs * share
+        self.prompt_tokens += other.prompt_tokens * share
+        self.completion_tokens += other.completion_tokens * share
+        self.cached_tokens += other.cached_tokens * share
+        self.cost += other.cost * share
+        self.cost_known = self.cost_known and other.cost_known
+        self.model = other.model or self.model
+        self.batch_size = max(self.batch_size, other.batch_size)
+
+    def to_dict(self):
+        return {
+            'file': self.filename,
+            'job': self.job,
+            'model': self.model,
+            'cached': self.cached,
+            'batch_size': self.batch_size,
+            'seconds': {stage: round(value, 4) for stage, value in self.seconds.items()},
+            'wall_seconds': round(time.monotonic() - self.started, 4),
+            'retries': round(self.retries, 2),
+            'repairs': round(self.repairs, 2),
+            'prompt_tokens': round(self.prompt_tokens),
+            'completion_tokens': round(self.completion_tokens),
+            'cached_tokens': round(self.cached_tokens),
+            'cost_usd': round(self.cost, 6) if self.cost_known else None,
+            'text_tokens_before': self.compaction['tokens_before'] if self.compaction else None,
+            'text_tokens_after': self.compaction['tokens_after'] if self.compaction else None,
+            'truncated': bool(self.compaction and self.compaction['truncated']),
+        }
+
+
+class NullTrace(ResumeTrace):
+    """Trace that records nothing, used when the caller doesn't pass one"""
+
+    def add_time(self, stage, seconds):
+        pass
+
+    def mark_cached(self):
+        pass
+
+    def mark_repaired(self):
+        pass
+
+    def add_compaction(self, stats):
+        pass
+
+    def add_response(self, response_json, model, attempts=1):
+        pass
+
+    def merge(self, other, share=1.0):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class RunRecorder:
+    """Streams finished traces for a run to a JSONL file and keeps running totals for the report.
+
+    Only the totals and the slowest traces stay in memory, so memory stays flat however
+    many resumes a run (or a --watch session) scores. The trace file is only (re)created
+    once the first trace finishes, so a run with nothing to do leaves the previous run's
+    trace in place.
+    """
+
+    def __init__(self, result_folder, run_id, slowest=10):
+        self.result_folder = result_folder
+        self.run_id = run_id
+        self.slowest = slowest
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._trace_file = None
+        self._totals = {
+            'statuses': {}, 'cached': 0, 'stage_seconds': dict.fromkeys(STAGES, 0.0), 'retries': 0.0, 'repairs': 0.0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'cost_usd': 0.0, 'cost_known': True,
+            'text_tokens_before': 0, 'text_tokens_after': 0, 'truncated': 0,
+        }
+        self._slowest = []  # Min-heap of (wall_seconds, sequence, trace) holding the slowest traces
+        self._sequence = itertools.count()
+
+    def finish(self, trace, status):
+        """Record a trace as done with status 'scored', 'duplicate' (score copied), 'escalated' (rescored by the cascade model), 'filtered' (left out by the pre-filter) or 'failed'"""
+        entry = {'run_id': self.run_id, 'status': status, **trace.to_dict()}
+        with self._lock:
+            if self._trace_file is None:
+                self._trace_file = open(os.path.join(self.result_folder, TRACE_FILENAME), 'w', encoding='utf-8')
+            self._trace_file.write(json.dumps(entry) + '\n')
+            self._trace_file.flush()
+            self._add_to_totals(entry)
+
+    def _add_to_totals(self, entry):
+        totals = self._totals
+        totals['statuses'][entry['status']] = totals['statuses'].get(entry['status'], 0) + 1
+        totals['cached'] += bool(entry['cached'])
+        for stage in STAGES:
+            totals['stage_seconds'][stage] += entry['seconds'][stage]
+        for key in ('retries', 'repairs', 'prompt_tokens', 'completion_tokens', 'cached_tokens'):
+            totals[key] += entry[key]
+        if entry['cost_usd'] is None:
+            totals['cost_known'] = False
+        else:
+            totals['cost_usd'] += entry['cost_usd']
+        totals['text_tokens_before'] += entry['text_tokens_before'] or 0
+        totals['text_tokens_after'] += entry['text_tokens_after'] or 0
+        totals['truncated'] += bool(entry['truncated'])
+        if self.slowest > 0:
+            item = (entry['wall_seconds'], next(self._sequence), entry)
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, item)
+            elif item[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def close(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+
+    def report(self, discovered, stages=None):
+        """Summarize the run: throughput, totals per stage, tokens, cost and the slowest files"""
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            totals = {key: dict(value) if isinstance(value, dict) else value for key, value in self._totals.items()}
+            slowest = [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+        statuses = totals['statuses']
+        return {
+            'run_id': self.run_id,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'elapsed_seconds': round(elapsed, 3),
+            'discovered': discovered,
+            'scored': statuses.get('scored', 0),
+            'duplicates': statuses.get('duplicate', 0),
+            'escalated': statuses.get('escalated', 0),
+            'filtered': statuses.get('filtered', 0),
+            'failed': statuses.get('failed', 0),
+            'cached': totals['cached'],
+            'resumes_per_second': round(statuses.get('scored', 0) / elapsed, 3) if elapsed > 0 else 0.0,
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in totals['stage_seconds'].items()},
+            'retries': round(totals['retries'], 2),
+            'repairs': round(totals['repairs'], 2),
+            'prompt_tokens': totals['prompt_tokens'],
+            'completion_tokens': totals['completion_tokens'],
+            'cached_tokens': totals['cached_tokens'],
+            'cost_usd': round(totals['cost_usd'], 6) if totals['cost_known'] else None,
+            'text_tokens_before': totals['text_tokens_before'],
+            'text_tokens_after': totals['text_tokens_after'],
+            'truncated': totals['truncated'],
+            'slowest': slowest,
+            'pipeline': stages or [],
+        }
+
+    def save_report(self, report):
+        path = os.path.join(self.result_folder, REPORT_FILENAME)
+        with atomic_write(path) as f:
+            json.dump(report, f, indent=4)
+        return path
+
+
+def format_openmetrics(report):
+    """Render a run report in the OpenMetrics text format (readable by Prometheus)"""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# TYPE {name} {kind}')
+        lines.append(f'# HELP {name} {help_text}')
+        suffix = '_total' if kind == 'counter' else ''
+        for labels, value in samples:
+            label_text = '{' + ','.join(f'{key}="{val}"' for key, val in labels.items()) + '}' if labels else ''
+            lines.append(f'{name}{suffix}{label_text} {value}')
+
+    metric('resume_scorer_resumes', 'counter', 'Resumes processed in the last run',
+           [({'status': 'scored'}, report['scored']), ({'status': 'failed'}, report['failed']),
+            ({'status': 'cached'}, report['cached']), ({'status': 'duplicate'}, report['duplicates']),
+            ({'status': 'escalated'}, report['escalated']), ({'status': 'filtered'}, report['filtered'])])
+    metric('resume_scorer_stage_seconds', 'counter', 'Seconds spent per stage in the last run',
+           [({'stage': stage}, seconds) for stage, seconds in report['stage_seconds'].items()])
+    metric('resume_scorer_tokens', 'counter', 'Tokens used in the last run',
+           [({'type': 'prompt'}, report['prompt_tokens']), ({'type': 'completion'}, report['completion_tokens']),
+            ({'type': 'cached_prompt'}, report['cached_tokens'])])
+    metric('resume_scorer_text_tokens', 'counter', 'Resume text tokens before and after compaction in the last run',
+           [({'text': 'raw'}, report['text_tokens_before']), ({'text': 'compacted'}, report['text_tokens_after'])])
+    metric('resume_scorer_retries', 'counter', 'API retries in the last run', [({}, report['retries'])])
+    metric('resume_scorer_repairs', 'counter', 'Malformed replies repaired or rescored in the last run', [({}, report['repairs'])])
+    if report['cost_usd'] is not None:
+        metric('resume_scorer_cost_usd', 'counter', 'Estimated cost of the last run in USD', [({}, report['cost_usd'])])
+    metric('resume_scorer_run_seconds', 'gauge', 'Wall time of the last run', [({}, report['elapsed_seconds'])])
+    metric('resume_scorer_throughput', 'gauge', 'Resumes scored per second in the last run',
+           [({}, report['resumes_per_second'])])
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics_file(path, report):
+    """Write the metrics atomically, so a scraper (e.g. node_exporter's textfile collector) never reads half a file"""
+    with atomic_write(path) as f:
+        f.write(format_openmetrics(report))
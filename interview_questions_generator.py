@@ -1,8 +1,12 @@
 import os
 import json
-import requests
-import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from openrouter_client import post_chat_completion, APIError
+from response_cache import get_response_cache, make_cache_key
+from candidate_index import get_candidate_index
+from atomic_io import atomic_write
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,34 +16,24 @@ RESULT_FOLDER = os.getenv('RESULT_FOLDER', 'results')
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
 OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
 MAX_RETRIES = 3  # Maximum number of retry attempts for API calls
+CONCURRENCY = max(1, int(os.getenv('CONCURRENCY', '4')))  # Candidates handled in parallel in batch mode
+BATCH_OUTPUT_FOLDER = 'interview_questions'
 
-def list_candidates():
-    """List all available candidates from the results folder"""
-    candidates = []
-    
-    # Check all result folders
-    result_folders = [folder for folder in os.listdir() if folder.startswith('results_')]
-    
-    for folder in result_folders:
-        if os.path.isdir(folder):
-            # Get all JSON files in the folder
-            json_files = [f for f in os.listdir(folder) if f.endswith('.json') and not f.startswith('_')]
-            
-            for json_file in json_files:
-                try:
-                    with open(os.path.join(folder, json_file), 'r') as f:
-                        data = json.load(f)
-                        if 'name' in data and 'original_filename' in data:
-                            candidates.append({
-                                'name': data['name'],
-                                'filename': data['original_filename'],
-                                'result_file': os.path.join(folder, json_file),
-                                'resume_file': os.path.join(folder, json_file.replace('.json', '.pdf.txt'))
-                            })
-                except Exception as e:
-                    print(f"Error reading {json_file}: {e}")
-    
-    return candidates
+def candidate_result_folders():
+    """Result folders from earlier runs: results_* folders, RESULT_FOLDER and its per-job subfolders"""
+    folders = [folder for folder in os.listdir() if folder.startswith('results_') and os.path.isdir(folder)]
+    if os.path.isdir(RESULT_FOLDER):
+        folders.append(RESULT_FOLDER)
+        folders += [entry.path for entry in os.scandir(RESULT_FOLDER) if entry.is_dir() and entry.name != BATCH_OUTPUT_FOLDER]
+    return folders
+
+def list_candidates(requisition=None, min_score=None, max_score=None, name_prefix=None):
+    """List scored candidates from the candidate index, highest score first"""
+    index = get_candidate_index()
+    if not index.is_backfilled():
+        # Results saved before the index existed are picked up once
+        print(f"Indexed {index.backfill(candidate_result_folders())} candidates from earlier results.")
+    return index.search(requisition=requisition, min_score=min_score, max_score=max_score, name_prefix=name_prefix)
 
 def get_resume_text(resume_file):
     """Get the text content of a resume"""
@@ -50,8 +44,16 @@ def get_resume_text(resume_file):
         print(f"Error reading resume file: {e}")
         return ""
 
-def generate_interview_questions(resume_text, additional_prompt=""):
+def generate_interview_questions(resume_text, additional_prompt="", verbose=True):
     """Generate interview questions based on the resume text"""
+    try:
+        return request_interview_questions(resume_text, additional_prompt, verbose)
+    except (APIError, KeyError, IndexError) as e:
+        print(f"ERROR: {e}")
+        return "Error generating interview questions. Please try again later."
+
+def request_interview_questions(resume_text, additional_prompt="", verbose=True):
+    """Return the model's interview questions for a resume; API errors are raised"""
     
     system_message = """You are an expert technical interviewer for a web development position. 
 Your task is to analyze the candidate's resume and generate thoughtful interview questions.
@@ -96,11 +98,6 @@ Additional Instructions: {additional_prompt}
 
 Please generate appropriate interview questions based on this resume."""
 
-    headers = {
-        'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
     data = {
         'model': OPENROUTER_MODEL,
         'messages': [
@@ -115,21 +112,35 @@ Please generate appropriate interview questions based on this resume."""
         ]
     }
     
-    for attempt in range(MAX_RETRIES):
+    # Reuse questions generated earlier for the same model, prompts and resume
+    cache = get_response_cache()
+    cache_key = make_cache_key('interview', OPENROUTER_MODEL, system_message, resume_text, additional_prompt)
+    cached_questions = cache.get(cache_key)
+    if cached_questions is not None:
+        if verbose: print("Using cached interview questions.")
+        return cached_questions
+    
+    if verbose: print("Generating interview questions...")
+    response_json = post_chat_completion(data, OPENROUTER_API_KEY, max_retries=MAX_RETRIES,
+                                         verbose=verbose, label="interview questions request")
+    questions = response_json['choices'][0]['message']['content']
+    
+    cache.set(cache_key, questions)
+    return questions
+
+def extract_questions_json(questions):
+    """Return the JSON part of a questions reply as a dict, or None if it has none"""
+    start = questions.find('{')
+    while start != -1:
         try:
-            print(f"Generating interview questions (attempt {attempt + 1})...")
-            response = requests.post('https://openrouter.ai/api/v1/chat/completions', headers=headers, json=data)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content']
-        except Exception as e:
-            print(f"API call attempt {attempt + 1} failed with error: {e}")
-            if attempt < MAX_RETRIES - 1:
-                wait_time = 2 ** attempt  # Exponential backoff
-                print(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print(f"ERROR: API call failed after {MAX_RETRIES} attempts.")
-                return "Error generating interview questions. Please try again later."
+            parsed, _ = json.JSONDecoder().raw_decode(questions[start:])
+        except json.JSONDecodeError:
+            start = questions.find('{', start + 1)
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+        start = questions.find('{', start + 1)
+    return None
 
 def save_questions(candidate_name, questions, additional_prompt):
     """Save the generated questions to a file"""
@@ -144,7 +155,107 @@ def save_questions(candidate_name, questions, additional_prompt):
     
     print(f"\nQuestions saved to {filename}")
 
-def main():
+def select_top_candidates(result_folder, top=None, min_score=None):
+    """Return the ranked results of a result folder, limited to the top N and/or a minimum score"""
+    final_results = os.path.join(result_folder, '_final_results.json')
+    if not os.path.exists(final_results):
+        return None
+    with open(final_results, 'r') as f:
+        results = json.load(f)
+    results.sort(key=lambda result: result['score'], reverse=True)
+    if min_score is not None:
+        results = [result for result in results if result['score'] >= min_score]
+    if top is not None:
+        results = results[:top]
+    return results
+
+def generate_for_candidate(result, result_folder, additional_prompt, output_folder):
+    """Generate and save the question pack for one ranked result; returns its index entry"""
+    entry = {
+        'name': result['name'],
+        'score': result['score'],
+        'original_filename': result['original_filename'],
+    }
+    resume_text = get_resume_text(os.path.join(result_folder, f"{result['original_filename']}.txt"))
+    if not resume_text:
+        return {**entry, 'status': 'failed', 'error': 'resume text not found'}
+    try:
+        questions = request_interview_questions(resume_text, additional_prompt, verbose=False)
+    except (APIError, KeyError, IndexError) as e:
+        return {**entry, 'status': 'failed', 'error': str(e)}
+
+    output_file = os.path.join(output_folder, f"{os.path.splitext(result['original_filename'])[0]}.json")
+    with atomic_write(output_file) as f:
+        json.dump({
+            **entry,
+            'reason': result.get('reason'),
+            'model': OPENROUTER_MODEL,
+            'additional_prompt': additional_prompt,
+            'questions': extract_questions_json(questions),
+            'raw': questions,
+        }, f, indent=4)
+    return {**entry, 'status': 'generated', 'file': output_file}
+
+def run_batch(result_folder, top=None, min_score=None, additional_prompt="", output_folder=None, concurrency=CONCURRENCY):
+    """Generate question packs for the best ranked candidates of a result folder concurrently"""
+    candidates = select_top_candidates(result_folder, top, min_score)
+    if candidates is None:
+        print(f"No final results found in {result_folder}. Please run the resume scorer first.")
+        return None
+    if not candidates:
+        print("No candidates match the selection.")
+        return []
+
+    output_folder = output_folder or os.path.join(result_folder, BATCH_OUTPUT_FOLDER)
+    os.makedirs(output_folder, exist_ok=True)
+    print(f"Generating interview questions for {len(candidates)} candidates with {concurrency} workers...")
+
+    # Requests share the client's rate limiter and retries, so concurrency is safe to raise
+    index = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(generate_for_candidate, result, result_folder, additional_prompt, output_folder)
+                   for result in candidates]
+        for future in as_completed(futures):
+            entry = future.result()
+            index.append(entry)
+            if entry['status'] == 'generated':
+                print(f"Generated questions for {entry['name']} ({entry['score']})")
+            else:
+                print(f"Failed to generate questions for {entry['name']}: {entry['error']}")
+
+    index.sort(key=lambda entry: entry['score'], reverse=True)
+    index_file = os.path.join(output_folder, '_index.json')
+    with atomic_write(index_file) as f:
+        json.dump({'result_folder': result_folder, 'additional_prompt': additional_prompt, 'candidates': index}, f, indent=4)
+    generated = sum(1 for entry in index if entry['status'] == 'generated')
+    print(f"\nGenerated {generated} of {len(index)} question packs. Index saved to {index_file}")
+    return index
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate interview questions from scored resumes.')
+    parser.add_argument('--batch', action='store_true',
+                        help='generate questions for the best ranked candidates without prompting')
+    parser.add_argument('--result-folder', default=RESULT_FOLDER, help='result folder to read _final_results.json from')
+    parser.add_argument('--top', type=int, help='only the N highest scoring candidates (default 10 unless --min-score is set)')
+    parser.add_argument('--min-score', type=float, help='only candidates scoring at least this much')
+    parser.add_argument('--prompt', default='', help='additional instructions for question generation')
+    parser.add_argument('--output-folder', help='where to save the question packs (default <result folder>/interview_questions)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='candidates processed in parallel')
+    parser.add_argument('--requisition', help='only list candidates of this requisition (result folder name)')
+    parser.add_argument('--max-score', type=float, help='only list candidates scoring at most this much')
+    parser.add_argument('--name', help='only list candidates whose name starts with this')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch:
+        if not OPENROUTER_API_KEY:
+            print("ERROR: OpenRouter API key is not set. Please set it in the .env file.")
+            return
+        top = args.top if args.top is not None or args.min_score is not None else 10
+        run_batch(args.result_folder, top, args.min_score, args.prompt, args.output_folder, max(1, args.concurrency))
+        return
+
     print("\n===== Interview Questions Generator =====\n")
     
     # Check if API key is set
@@ -153,8 +264,8 @@ def main():
         print("Get your OpenRouter API key at: https://openrouter.ai/keys")
         return
     
-    # List all candidates
-    candidates = list_candidates()
+    # List the candidates matching the filters
+    candidates = list_candidates(args.requisition, args.min_score, args.max_score, args.name)
     
     if not candidates:
         print("No candidates found. Please run the resume scorer first.")
@@ -163,7 +274,7 @@ def main():
     # Display candidates
     print("Available candidates:")
     for i, candidate in enumerate(candidates):
-        print(f"{i+1}. {candidate['name']}")
+        print(f"{i+1}. {candidate['name']} ({candidate['score']}, {candidate['requisition']})")
     
     # Prompt for candidate selection
     while True:
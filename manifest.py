@@ -0,0 +1,82 @@
+import os
+import time
+import sqlite3
+import threading
+
+# Per result folder record of every resume seen: its size, mtime and content hash plus
+# its processing state. Startup only has to hash and rescore files that changed. Each
+# state change is committed right away, so the manifest doubles as a journal: after a
+# crash the next run picks up exactly the files that were never marked scored.
+
+MANIFEST_FILENAME = '_manifest.sqlite3'
+
+STATE_PENDING = 'pending'  # Queued for scoring
+STATE_IN_FLIGHT = 'in_flight'  # Sent to the model; the result isn't saved yet
+STATE_SCORED = 'scored'
+STATE_FAILED = 'failed'
+STATE_FILTERED = 'filtered'  # Left out by the pre-filter; reconsidered on the next run
+UNFINISHED_STATES = (STATE_PENDING, STATE_IN_FLIGHT, STATE_FAILED)
+
+
+class RunManifest:
+    """SQLite-backed manifest of resume files and their processing state"""
+
+    def __init__(self, result_folder):
+        self.path = os.path.join(result_folder, MANIFEST_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS files (
+            filename TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT,
+            state TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )""")
+        self._conn.commit()
+        # One query at startup instead of one per file
+        self._rows = {
+            row[0]: row[1:]
+            for row in self._conn.execute('SELECT filename, size, mtime_ns, sha256, state FROM files')
+        }
+
+    def get(self, filename):
+        """Return (size, mtime_ns, sha256, state) for a file, or None if it has never been seen"""
+        return self._rows.get(filename)
+
+    def record(self, filename, size, mtime_ns, sha256, state):
+        with self._lock:
+            self._rows[filename] = (size, mtime_ns, sha256, state)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (filename, size, mtime_ns, sha256, state, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (filename, size, mtime_ns, sha256, state, time.time())
+            )
+            self._conn.commit()
+
+    def set_state(self, filename, state):
+        with self._lock:
+            size, mtime_ns, sha256, _ = self._rows[filename]
+            self._rows[filename] = (size, mtime_ns, sha256, state)
+            self._conn.execute('UPDATE files SET state = ?, updated_at = ? WHERE filename = ?',
+                               (state, time.time(), filename))
+            self._conn.commit()
+
+    def unfinished(self):
+        """Return {filename: (size, mtime_ns, sha256, state)} for files an earlier run queued but never scored"""
+        return {filename: row for filename, row in self._rows.items() if row[3] in UNFINISHED_STATES}
+
+    def scored(self):
+        """Return {filename: (size, mtime_ns, sha256, state)} for files with a saved result"""
+        return {filename: row for filename, row in self._rows.items() if row[3] == STATE_SCORED}
+
+    def filtered(self):
+        """Return {filename: (size, mtime_ns, sha256, state)} for files the pre-filter left out"""
+        return {filename: row for filename, row in self._rows.items() if row[3] == STATE_FILTERED}
+
+    def counts(self):
+        """Return the number of files in each state"""
+        counts = {}
+        for _, _, _, state in self._rows.values():
+            counts[state] = counts.get(state, 0) + 1
+        return counts
@@ -0,0 +1,278 @@
+import os
+import time
+import random
+import threading
+import email.utils
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx  # Optional, only needed for HTTP/2
+except ImportError:
+    httpx = None
+
+# Shared helpers for calling the OpenRouter chat completions API from both scripts
+
+DEFAULT_BASE_URL = 'https://openrouter.ai/api/v1'
+
+# Status codes that are worth retrying; everything else in the 4xx range is fatal
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 60
+
+
+class APIError(Exception):
+    """Base class for OpenRouter API errors"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FatalAPIError(APIError):
+    """An error that will not go away by retrying (bad key, bad request, no credits...)"""
+
+
+class RetryableAPIError(APIError):
+    """A transient error (throttling, 5xx, network) that persisted through every retry"""
+
+
+def parse_retry_after(headers):
+    """Return the number of seconds a Retry-After header asks us to wait, or None"""
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_reset(headers):
+    """Return seconds until the X-RateLimit-Reset time, or None if the header is absent"""
+    value = headers.get('X-RateLimit-Reset') if headers else None
+    if not value:
+        return None
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+    # The header may be an epoch timestamp in milliseconds, in seconds, or a plain delay
+    if reset > 1e12:
+        return max(0.0, reset / 1000 - time.time())
+    if reset > 1e9:
+        return max(0.0, reset - time.time())
+    return reset
+
+
+class RateLimiter:
+    """Token bucket whose refill rate adapts to the provider (AIMD).
+
+    Every successful request nudges the rate up by a constant step; a 429 halves it
+    (at most once per throttling window, so a burst of 429s counts once) and pauses
+    all callers until the provider's Retry-After has elapsed.
+    """
+
+    def __init__(self, rate=5.0, min_rate=0.2, max_rate=50.0, increase=0.5, decrease=0.5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            rate=float(os.getenv('RATE_LIMIT_RPS', '5')),
+            min_rate=float(os.getenv('RATE_LIMIT_MIN_RPS', '0.2')),
+            max_rate=float(os.getenv('RATE_LIMIT_MAX_RPS', '50')),
+        )
+
+    def acquire(self):
+        """Block until the caller is allowed to send one request"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                capacity = max(1.0, self.rate)
+                self._tokens = min(capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self, headers=None):
+        """Speed up a little, unless the provider says the current window is used up"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            remaining = headers.get('X-RateLimit-Remaining') if headers else None
+            if remaining is not None and remaining.strip() == '0':
+                reset = parse_rate_limit_reset(headers)
+                if reset:
+                    self._paused_until = max(self._paused_until, time.monotonic() + reset)
+
+    def on_throttle(self, retry_after=None):
+        """Back off after the provider pushed back with a 429"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= max(1.0, retry_after or 0):
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+            self._tokens = 0.0
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter shared by every API caller"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter.from_env()
+        return _shared_limiter
+
+
+def chat_completions_url():
+    """The chat completions endpoint; OPENROUTER_BASE_URL can point at a mock or proxy server"""
+    return os.getenv('OPENROUTER_BASE_URL', DEFAULT_BASE_URL).rstrip('/') + '/chat/completions'
+
+
+class HTTPClient:
+    """One pooled, keep-alive HTTP client shared by every API call in the process.
+
+    Uses a requests Session by default, or an httpx client when HTTP2=True and httpx
+    (with its http2 extra) is installed. Responses are gzip/deflate compressed and
+    every request has connect and read timeouts, so a hung socket can't stall a run.
+    """
+
+    def __init__(self, pool_size=32, connect_timeout=10.0, read_timeout=120.0, http2=False):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        default_headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip, deflate'}
+
+        if http2 and httpx is None:
+            print("WARNING: HTTP2 is enabled but httpx is not installed (pip install 'httpx[http2]'); using HTTP/1.1")
+        self.http2 = bool(http2 and httpx is not None)
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                headers=default_headers,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+            self.network_errors = (httpx.TransportError,)
+        else:
+            self._client = requests.Session()
+            self._client.headers.update(default_headers)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            self._client.mount('https://', adapter)
+            self._client.mount('http://', adapter)
+            self.network_errors = (requests.RequestException,)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            pool_size=int(os.getenv('HTTP_POOL_SIZE', os.getenv('CONCURRENCY', '32'))),
+            connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', '10')),
+            read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', '120')),
+            http2=os.getenv('HTTP2', 'False').lower() in ['true', '1', 't', 'yes'],
+        )
+
+    def post(self, url, headers, json):
+        if self.http2:
+            return self._client.post(url, headers=headers, json=json)
+        return self._client.post(url, headers=headers, json=json, timeout=(self.connect_timeout, self.read_timeout))
+
+    def close(self):
+        self._client.close()
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide pooled HTTP client"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = HTTPClient.from_env()
+        return _shared_client
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for errors that don't carry a Retry-After"""
+    return min(MAX_BACKOFF_SECONDS, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def post_chat_completion(data, api_key, max_retries=3, max_throttle_retries=8, verbose=False, label='request', stats=None):
+    """POST a chat completion request and return the decoded JSON response.
+
+    Throttled (429) responses are paced by the shared rate limiter and don't count
+    against max_retries. Other transient errors are retried with backoff, and
+    fatal errors (e.g. 401, 400) are raised immediately as FatalAPIError.
+    If a stats dict is passed, the number of attempts made is stored in stats['attempts'].
+    """
+    limiter = get_rate_limiter()
+    client = get_http_client()
+    url = chat_completions_url()
+    # Content-Type and compression are session defaults; only the key is per request
+    headers = {'Authorization': f'Bearer {api_key}'}
+
+    attempt = 0
+    throttled = 0
+    while True:
+        limiter.acquire()
+        if stats is not None:
+            stats['attempts'] = attempt + throttled + 1
+        if verbose: print(f"Sending {label} to API (attempt {attempt + throttled + 1})")
+        try:
+            response = client.post(url, headers=headers, json=data)
+        except client.network_errors as e:
+            error = RetryableAPIError(f"Network error: {e}")
+            retry_after = None
+        else:
+            if response.status_code < 400:
+                limiter.on_success(response.headers)
+                return response.json()
+
+            message = f"HTTP {response.status_code}: {response.text[:200]}"
+            retry_after = parse_retry_after(response.headers)
+            if response.status_code == 429:
+                limiter.on_throttle(retry_after)
+                throttled += 1
+                if throttled <= max_throttle_retries:
+                    if verbose: print(f"{label} was rate limited, slowing down to {limiter.rate:.2f} req/s")
+                    # The limiter already paused for Retry-After; without one, wait before the next try
+                    if retry_after is None:
+                        time.sleep(backoff_delay(throttled - 1))
+                    continue
+                raise RetryableAPIError(f"Still rate limited after {throttled} attempts ({message})", 429)
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                raise FatalAPIError(message, response.status_code)
+            error = RetryableAPIError(message, response.status_code)
+
+        if verbose: print(f"API call for {label} failed with error: {error}")
+        attempt += 1
+        if attempt >= max_retries:
+            raise RetryableAPIError(f"API call failed after {max_retries} attempts ({error})", error.status_code)
+        wait_time = retry_after if retry_after is not None else backoff_delay(attempt - 1)
+        if verbose: print(f"Retrying {label} in {wait_time:.1f} seconds...")
+        time.sleep(wait_time)
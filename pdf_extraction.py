@@ -0,0 +1,51 @@
+import os
+import hashlib
+import PyPDF2
+
+from atomic_io import atomic_write
+
+# PDF text extraction helpers. Kept free of import-time side effects so they can run
+# inside worker processes.
+
+DEFAULT_TEXT_CACHE_DIR = os.path.join('.cache', 'text')
+
+
+def extract_text_from_pdf(pdf_path):
+    """Extract the text of every page of a PDF, with a form feed between pages"""
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return '\f'.join(page.extract_text() or '' for page in reader.pages)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash a file's bytes without loading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_cache_path(cache_dir, content_hash):
+    """Cached text lives in a directory sharded by the first two hex digits of the hash"""
+    return os.path.join(cache_dir, content_hash[:2], f'{content_hash}.txt')
+
+
+def extract_text_cached(pdf_path, cache_dir=DEFAULT_TEXT_CACHE_DIR, content_hash=None):
+    """Return the PDF's text, reusing the cached copy for identical file contents.
+
+    Renamed or duplicated PDFs hash to the same entry, so each distinct file is
+    only parsed once. Pass content_hash if the caller has already hashed the file.
+    """
+    cache_file = text_cache_path(cache_dir, content_hash or file_sha256(pdf_path))
+    if os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    text = extract_text_from_pdf(pdf_path)
+
+    # Written atomically so concurrent workers never see a partial file
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with atomic_write(cache_file) as f:
+        f.write(text)
+    return text
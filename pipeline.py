@@ -0,0 +1,184 @@
+import time
+import queue
+import threading
+
+# A small staged pipeline: a source generator feeds a chain of stages, each with its
+# own worker threads, connected by bounded queues so memory stays flat however many
+# items flow through.
+
+_DONE = object()  # Sentinel telling a worker that its upstream has finished
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class Stage:
+    """One step of the pipeline.
+
+    func receives one item (or a list of up to batch_size items when batch_size > 1)
+    and returns an iterable of items for the next stage, or None to emit nothing.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=64, batch_size=1, batch_timeout=0.5):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+        self.input = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.latencies = []  # Seconds spent in func per call
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed):
+        latency_ms = [latency * 1000 for latency in self.latencies]
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'queue_depth': self.input.qsize(),
+            'processed': self.processed,
+            'errors': self.errors,
+            'throughput': self.processed / elapsed if elapsed > 0 else 0.0,
+            'utilization': self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0,
+            'p50_ms': percentile(latency_ms, 0.50),
+            'p95_ms': percentile(latency_ms, 0.95),
+            'p99_ms': percentile(latency_ms, 0.99),
+        }
+
+
+class Pipeline:
+    """Runs a source iterable through a list of stages until everything has drained"""
+
+    def __init__(self, source, stages, source_name='discover'):
+        self.source = source
+        self.source_name = source_name
+        self.stages = stages
+        self.discovered = 0
+        self.started_at = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        """Stop feeding new items; items already queued are drained without being processed"""
+        self._stopped.set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        source_stats = {
+            'stage': self.source_name,
+            'workers': 1,
+            'queue_depth': 0,
+            'processed': self.discovered,
+            'errors': 0,
+            'throughput': self.discovered / elapsed if elapsed > 0 else 0.0,
+            'utilization': None,
+            'p50_ms': None,
+            'p95_ms': None,
+            'p99_ms': None,
+        }
+        return [source_stats] + [stage.stats(elapsed) for stage in self.stages]
+
+    def format_stats(self):
+        lines = [f"{'stage':<10} {'workers':>7} {'queue':>6} {'done':>7} {'errors':>6} {'items/s':>8} {'busy':>6}"]
+        for s in self.stats():
+            busy = f"{s['utilization']:.0%}" if s['utilization'] is not None else '-'
+            lines.append(f"{s['stage']:<10} {s['workers']:>7} {s['queue_depth']:>6} {s['processed']:>7} "
+                         f"{s['errors']:>6} {s['throughput']:>8.2f} {busy:>6}")
+        return '\n'.join(lines)
+
+    def run(self, stats_interval=0):
+        """Run until the source is exhausted and every stage has drained.
+
+        When stats_interval > 0, per-stage stats are printed every stats_interval seconds.
+        """
+        self.started_at = time.monotonic()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            finished = {'count': 0}
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(stage, downstream, finished), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        monitor_done = threading.Event()
+        if stats_interval > 0:
+            threading.Thread(target=self._monitor, args=(stats_interval, monitor_done), daemon=True).start()
+
+        first = self.stages[0]
+        try:
+            for item in self.source:
+                if self.stopped:
+                    break
+                self.discovered += 1
+                first.input.put(item)
+        finally:
+            for _ in range(first.workers):
+                first.input.put(_DONE)
+            for thread in threads:
+                thread.join()
+            monitor_done.set()
+
+    def _monitor(self, interval, done):
+        while not done.wait(interval):
+            print(self.format_stats())
+
+    def _next_batch(self, stage):
+        """Block for one item, then gather up to batch_size items; returns (items, upstream_done)"""
+        item = stage.input.get()
+        if item is _DONE:
+            return [], True
+        items = [item]
+        deadline = time.monotonic() + stage.batch_timeout
+        while len(items) < stage.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = stage.input.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _worker(self, stage, downstream, finished):
+        while True:
+            items, upstream_done = self._next_batch(stage)
+            if items and not self.stopped:
+                started = time.monotonic()
+                try:
+                    outputs = stage.func(items if stage.batch_size > 1 else items[0])
+                    for output in outputs or ():
+                        if downstream is not None:
+                            downstream.input.put(output)
+                except Exception as e:
+                    with stage._lock:
+                        stage.errors += 1
+                    print(f"ERROR: Pipeline stage '{stage.name}' failed: {e}")
+                duration = time.monotonic() - started
+                with stage._lock:
+                    stage.processed += len(items)
+                    stage.busy_seconds += duration
+                    stage.latencies.append(duration)
+            if upstream_done:
+                break
+
+        # The last worker of a stage to finish tells every downstream worker to finish too
+        with stage._lock:
+            finished['count'] += 1
+            last = finished['count'] == stage.workers
+        if last and downstream is not None:
+            for _ in range(downstream.workers):
+                downstream.input.put(_DONE)
@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from collections import Counter
+
+from atomic_io import atomic_write
+
+# Cheap local first-pass ranking (BM25) of resume texts against a job description, used
+# to send only the most promising resumes to the LLM. Each result folder remembers its
+# last selection, so unchanged reruns don't pick another top K from the leftovers.
+
+SELECTION_FILENAME = '_prefilter.json'
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+STOPWORDS = {
+    'a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in',
+    'is', 'it', 'its', 'of', 'on', 'or', 'our', 'that', 'the', 'their', 'this', 'to', 'we', 'will',
+    'with', 'you', 'your', 'i', 'my', 'me', 'was', 'were', 'can', 'all', 'also', 'who', 'work',
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens, keeping terms like c++, c#, node.js and ci/cd parts intact"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory BM25 index over resume texts.
+
+    Each document is stored as a term-frequency Counter, so scoring a query only
+    touches the query's terms in each document.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.doc_freq = Counter()
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, doc_id, text):
+        terms = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self.doc_terms:
+                return
+            self.doc_terms[doc_id] = terms
+            self.doc_lengths[doc_id] = sum(terms.values())
+            self.total_length += self.doc_lengths[doc_id]
+            self.doc_freq.update(terms.keys())
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def score(self, query_text, doc_ids=None):
+        """Return {doc_id: bm25 score} of the query for the given documents (all by default)"""
+        doc_ids = self.doc_terms.keys() if doc_ids is None else doc_ids
+        count = len(self.doc_terms)
+        if not count:
+            return {}
+        avg_length = self.total_length / count or 1.0
+        query_terms = set(tokenize(query_text))
+        idf = {
+            term: math.log(1 + (count - self.doc_freq[term] + 0.5) / (self.doc_freq[term] + 0.5))
+            for term in query_terms if self.doc_freq[term]
+        }
+
+        scores = {}
+        for doc_id in doc_ids:
+            terms = self.doc_terms[doc_id]
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+            total = 0.0
+            for term, weight in idf.items():
+                tf = terms.get(term)
+                if tf:
+                    total += weight * tf * (self.k1 + 1) / (tf + norm)
+            scores[doc_id] = total
+        return scores
+
+
+def select_top(scores, top_k=None, min_score=None):
+    """Normalize scores to 0-1 against the best match and pick which documents to keep.
+
+    Returns ({doc_id: normalized score}, set of selected doc_ids). A document is kept
+    if it is within the top_k and at or above min_score (either limit may be None).
+    """
+    best = max(scores.values(), default=0.0) or 1.0
+    normalized = {doc_id: round(score / best, 4) for doc_id, score in scores.items()}
+    ranked = sorted(normalized, key=normalized.get, reverse=True)
+    if top_k is not None:
+        ranked = ranked[:top_k]
+    if min_score is not None:
+        ranked = [doc_id for doc_id in ranked if normalized[doc_id] >= min_score]
+    return normalized, set(ranked)
+
+
+def selection_fingerprint(job_desc, additional_criteria, top_k=None, min_score=None):
+    """Hash of everything besides the resume pool that decides a selection"""
+    return hashlib.sha256(json.dumps([job_desc, additional_criteria or '', top_k, min_score]).encode('utf-8')).hexdigest()
+
+
+def load_selection(result_folder):
+    """Return the folder's last selection as {'fingerprint': ..., 'scores': {filename: normalized score}}, or None"""
+    try:
+        with open(os.path.join(result_folder, SELECTION_FILENAME), 'r', encoding='utf-8') as f:
+            selection = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return selection if isinstance(selection, dict) and isinstance(selection.get('scores'), dict) else None
+
+
+def save_selection(result_folder, fingerprint, scores):
+    """Store the pre-filter score of every resume in the pool, filtered ones included"""
+    with atomic_write(os.path.join(result_folder, SELECTION_FILENAME)) as f:
+        json.dump({'fingerprint': fingerprint, 'scores': scores}, f, indent=4, sort_keys=True)
@@ -0,0 +1,122 @@
+import os
+import json
+import sqlite3
+import threading
+
+# Incrementally maintained ranking of a result folder. save_result upserts each result,
+# so the final ranking and top-K queries never need to rescan every per-resume JSON.
+
+INDEX_FILENAME = '_ranking.sqlite3'
+
+
+class RankingIndex:
+    """SQLite table of results with an index on score"""
+
+    def __init__(self, result_folder):
+        self.result_folder = result_folder
+        self.path = os.path.join(result_folder, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS results (
+            result_key TEXT PRIMARY KEY,
+            score REAL NOT NULL,
+            name TEXT,
+            data TEXT NOT NULL
+        )""")
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_score ON results (score DESC)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self._conn.commit()
+        if self._get_meta('backfilled') is None:
+            self.rebuild()
+
+    def _get_meta(self, key):
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _bump_version(self):
+        self._set_meta('version', (self._get_meta('version') or 0) + 1)
+
+    def rebuild(self):
+        """Re-index every per-resume JSON in the folder (run once when the index is created)"""
+        rows = []
+        for entry in os.scandir(self.result_folder):
+            if not entry.name.endswith('.json') or entry.name.startswith('_'):
+                continue
+            with open(entry.path, 'r') as f:
+                try:
+                    result = json.load(f)
+                except json.JSONDecodeError:
+                    print(f"Warning: Could not decode JSON in {entry.name}")
+                    continue
+            if isinstance(result, dict) and 'score' in result:
+                rows.append((os.path.splitext(entry.name)[0], result['score'], result.get('name'), json.dumps(result)))
+
+        with self._lock:
+            self._conn.execute('DELETE FROM results')
+            self._conn.executemany('INSERT OR REPLACE INTO results (result_key, score, name, data) VALUES (?, ?, ?, ?)', rows)
+            self._set_meta('backfilled', 1)
+            self._bump_version()
+            self._conn.commit()
+
+    def upsert(self, result_key, result_data):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (result_key, score, name, data) VALUES (?, ?, ?, ?)',
+                (result_key, result_data['score'], result_data.get('name'), json.dumps(result_data))
+            )
+            self._bump_version()
+            self._conn.commit()
+
+    def delete(self, result_key):
+        """Drop a result, e.g. because its result file was deleted"""
+        with self._lock:
+            if self._conn.execute('DELETE FROM results WHERE result_key = ?', (result_key,)).rowcount:
+                self._bump_version()
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def ranked(self, limit=None):
+        """Return result dicts ordered by score, highest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT data FROM results ORDER BY score DESC LIMIT ?', (-1 if limit is None else limit,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def top(self, k):
+        return self.ranked(limit=k)
+
+    def is_exported(self):
+        """True when the final results file already reflects every change in the index"""
+        with self._lock:
+            return self._get_meta('exported_version') == self._get_meta('version')
+
+    def mark_exported(self):
+        with self._lock:
+            self._set_meta('exported_version', self._get_meta('version') or 0)
+            self._conn.commit()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_ranking_index(result_folder):
+    """Return the shared ranking index for a result folder"""
+    key = os.path.abspath(result_folder)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = RankingIndex(result_folder)
+        return _indexes[key]
+
+
+def top_candidates(result_folder, k=10):
+    """Return the k highest scoring results in a result folder"""
+    return get_ranking_index(result_folder).top(k)
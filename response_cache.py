@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Persistent, content-addressed cache of LLM responses shared by every run and result folder
+
+DEFAULT_CACHE_PATH = os.path.join('.cache', 'responses.sqlite3')
+EVICT_EVERY = 500  # Run eviction after this many writes
+
+
+def make_cache_key(*parts):
+    """Hash everything that influences a response (model, prompts, resume text...) into a key"""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed key/value store with age and size based eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=50000, max_age_days=30):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )""")
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used_at)')
+        self._conn.commit()
+        self.evict()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv('RESPONSE_CACHE_PATH', DEFAULT_CACHE_PATH),
+            max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '50000')),
+            max_age_days=float(os.getenv('RESPONSE_CACHE_MAX_AGE_DAYS', '30')),
+        )
+
+    def get(self, key):
+        """Return the cached value for key, or None if it is missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE responses SET last_used_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, created_at, last_used_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            evict_now = self._writes % EVICT_EVERY == 0
+        if evict_now:
+            self.evict()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries"""
+        with self._lock:
+            if self.max_age_seconds:
+                self._conn.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - self.max_age_seconds,))
+            if self.max_entries:
+                self._conn.execute("""DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+            self._conn.commit()
+
+
+class NullCache:
+    """Stand-in used when caching is disabled"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache (a no-op cache if RESPONSE_CACHE is off)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            enabled = os.getenv('RESPONSE_CACHE', 'True').lower() in ['true', '1', 't', 'yes']
+            _shared_cache = ResponseCache.from_env() if enabled else NullCache()
+        return _shared_cache
@@ -0,0 +1,74 @@
+import os
+import csv
+import json
+import contextlib
+
+from atomic_io import atomic_write
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional; Parquet export is skipped without it
+    pyarrow = None
+
+# Compact exports of a result folder's ranking, written next to _final_results.json:
+# JSONL and CSV that can be streamed row by row, and Parquet (with pyarrow installed)
+# for fast loading into pandas, Polars or DuckDB.
+
+EXPORT_BASENAME = '_final_results'
+EXPORT_COLUMNS = ['rank', 'score', 'name', 'filename', 'model', 'run_id', 'reason', 'duplicate_of']
+DEFAULT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+def export_formats():
+    """Formats listed in EXPORT_FORMATS (default jsonl,csv,parquet); parquet only if pyarrow is installed"""
+    formats = [f.strip().lower() for f in os.getenv('EXPORT_FORMATS', ','.join(DEFAULT_FORMATS)).split(',') if f.strip()]
+    return [f for f in formats if f in DEFAULT_FORMATS and (f != 'parquet' or pyarrow is not None)]
+
+
+def export_paths(result_folder, formats=None):
+    return {fmt: os.path.join(result_folder, f'{EXPORT_BASENAME}.{fmt}') for fmt in (formats or export_formats())}
+
+
+def export_row(rank, result):
+    return {
+        'rank': rank,
+        'score': float(result['score']),
+        'name': result.get('name'),
+        'filename': result.get('original_filename'),
+        'model': result.get('model'),
+        'run_id': result.get('run_id'),
+        'reason': result.get('reason'),
+        'duplicate_of': result.get('duplicate_of'),
+    }
+
+
+def write_exports(results, result_folder, formats=None):
+    """Write ranked results (an iterable of result dicts, best first) in each format in one pass"""
+    paths = export_paths(result_folder, formats)
+    columns = {column: [] for column in EXPORT_COLUMNS} if 'parquet' in paths else None
+    with contextlib.ExitStack() as stack:
+        jsonl_file = stack.enter_context(atomic_write(paths['jsonl'])) if 'jsonl' in paths else None
+        csv_file = stack.enter_context(atomic_write(paths['csv'], newline='')) if 'csv' in paths else None
+        csv_writer = csv.DictWriter(csv_file, fieldnames=EXPORT_COLUMNS) if csv_file else None
+        if csv_writer:
+            csv_writer.writeheader()
+        for rank, result in enumerate(results, start=1):
+            row = export_row(rank, result)
+            if jsonl_file:
+                jsonl_file.write(json.dumps(row, ensure_ascii=False) + '\n')
+            if csv_writer:
+                csv_writer.writerow(row)
+            if columns is not None:
+                for column in EXPORT_COLUMNS:
+                    columns[column].append(row[column])
+
+    if columns is not None:
+        schema = pyarrow.schema([
+            ('rank', pyarrow.int32()), ('score', pyarrow.float64()), ('name', pyarrow.string()),
+            ('filename', pyarrow.string()), ('model', pyarrow.string()), ('run_id', pyarrow.string()),
+            ('reason', pyarrow.string()), ('duplicate_of', pyarrow.string()),
+        ])
+        with atomic_write(paths['parquet'], 'wb') as f:
+            pyarrow.parquet.write_table(pyarrow.Table.from_pydict(columns, schema=schema), f)
+    return paths
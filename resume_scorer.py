@@ -1,11 +1,30 @@
 import os
+import re
+import csv
 import json
-import uuid
-import PyPDF2
-import requests
+import math
 import time
+import uuid
 import shutil
+import functools
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+from pdf_extraction import extract_text_cached, file_sha256
+from openrouter_client import post_chat_completion, FatalAPIError, RetryableAPIError
+from response_cache import get_response_cache, make_cache_key
+from pipeline import Pipeline, Stage
+from ranking_index import get_ranking_index
+from candidate_index import get_candidate_index
+from result_export import write_exports, export_paths
+from manifest import RunManifest, STATE_PENDING, STATE_IN_FLIGHT, STATE_SCORED, STATE_FAILED, STATE_FILTERED
+from prefilter import BM25Index, select_top, selection_fingerprint, load_selection, save_selection
+from instrumentation import ResumeTrace, RunRecorder, NULL_TRACE, write_metrics_file
+from text_compaction import compact_resume_text, normalize_whitespace
+from atomic_io import atomic_write, remove_stale_temp_files
+from ingest import IngestedFile, ingest, format_counts
+from dedupe import DuplicateIndex, DUPLICATE_REPORT_FILENAME, get_signature_store, minhash_signature, write_duplicate_report
 
 # Check if .env file exists, if not copy from .env.example
 if not os.path.exists('.env'):
@@ -19,6 +38,7 @@ if not os.path.exists('.env'):
 JOB_DESC_FOLDER=job_descriptions
 RESULT_FOLDER=results
 BATCH_SIZE=1
+CONCURRENCY=4
 OPENROUTER_API_KEY=
 OPENROUTER_MODEL=openai/gpt-4o-mini
 DEBUG=False
@@ -29,10 +49,18 @@ DEBUG=False
 load_dotenv()
 
 # Prompt for API key and model
-def prompt_for_credentials():
+def prompt_for_credentials(interactive=True):
     current_api_key = os.getenv('OPENROUTER_API_KEY', '')
     current_model = os.getenv('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
     
+    if not interactive:
+        # Unattended runs take credentials from the environment, config file or command line
+        if not current_api_key:
+            print("ERROR: No API key set. Set OPENROUTER_API_KEY or pass --api-key.")
+            return False
+        os.environ['OPENROUTER_MODEL'] = current_model or 'openai/gpt-4o-mini'
+        return True
+    
     api_key_display = current_api_key[:5] + '...' + current_api_key[-5:] if current_api_key and len(current_api_key) > 10 else current_api_key
     
     print("\n=== OpenRouter API Configuration ===")
@@ -88,11 +116,14 @@ def update_env_file(key, value):
         f.writelines(env_lines)
 
 # Get user additional prioritization criteria (if any)
-def get_additional_criteria():
-    print("\nOptional: Enter additional prioritization criteria (e.g., 'Prioritize candidates from NUS and NTU')")
-    print("Leave blank if none. This will be added as supplementary guidance and won't override the main criteria.")
-    print("NOTE: Your input won't affect the required output format and will only be used for scoring consideration.")
-    additional_criteria = input("> ").strip()
+def get_additional_criteria(additional_criteria=None):
+    # Criteria passed in (from the command line or config) skip the prompt but are still filtered
+    if additional_criteria is None:
+        print("\nOptional: Enter additional prioritization criteria (e.g., 'Prioritize candidates from NUS and NTU')")
+        print("Leave blank if none. This will be added as supplementary guidance and won't override the main criteria.")
+        print("NOTE: Your input won't affect the required output format and will only be used for scoring consideration.")
+        additional_criteria = input("> ")
+    additional_criteria = additional_criteria.strip()
     
     # Filter out any potentially harmful instructions that might try to override format
     harmful_keywords = ["format", "output", "semicolon", "comma", "system", "message", "instruction", 
@@ -125,24 +156,57 @@ def get_additional_criteria():
     return additional_criteria
 
 # Configuration (will be loaded or prompted for)
-RESUME_FOLDER = os.getenv('RESUME_FOLDER', 'resumes')
-JOB_DESC_FOLDER = os.getenv('JOB_DESC_FOLDER', 'job_descriptions')
-RESULT_FOLDER = os.getenv('RESULT_FOLDER', 'results')
-BATCH_SIZE = int(os.getenv('BATCH_SIZE', '1'))  # Default to 1 for more reliable processing
-MAX_RETRIES = 3  # Maximum number of retry attempts for API calls
-DEBUG = os.getenv('DEBUG', 'False').lower() in ['true', '1', 't', 'yes']
+def load_settings():
+    """(Re)read the configuration from the environment, e.g. after applying command line options"""
+    global RESUME_FOLDER, JOB_DESC_FOLDER, RESULT_FOLDER, BATCH_SIZE, MAX_RETRIES, CONCURRENCY, EXTRACT_WORKERS
+    global PERSIST_WORKERS, QUEUE_SIZE, PIPELINE_STATS_INTERVAL, TEXT_CACHE_DIR, WATCH_INTERVAL, DEBUG
+    global PREFILTER_TOP_K, PREFILTER_MIN_SCORE, METRICS_FILE, COMPACT_TEXT, RESUME_TOKEN_BUDGET, STRUCTURED_OUTPUT
+    global DEDUPE, DEDUPE_THRESHOLD, PROMPT_CACHE_HINTS
+    global CASCADE_MODEL, CASCADE_TOP_PERCENT, CASCADE_MIN_SCORE, CASCADE_MAX_SCORE
+    RESUME_FOLDER = os.getenv('RESUME_FOLDER', 'resumes')
+    JOB_DESC_FOLDER = os.getenv('JOB_DESC_FOLDER', 'job_descriptions')
+    RESULT_FOLDER = os.getenv('RESULT_FOLDER', 'results')
+    BATCH_SIZE = int(os.getenv('BATCH_SIZE', '1'))  # Default to 1 for more reliable processing
+    MAX_RETRIES = 3  # Maximum number of retry attempts for API calls
+    CONCURRENCY = max(1, int(os.getenv('CONCURRENCY', '4')))  # Maximum number of resumes scored in parallel
+    EXTRACT_WORKERS = max(1, int(os.getenv('EXTRACT_WORKERS', str(os.cpu_count() or 1))))  # Processes used for PDF parsing
+    PERSIST_WORKERS = max(1, int(os.getenv('PERSIST_WORKERS', '1')))  # Threads writing result files
+    QUEUE_SIZE = max(1, int(os.getenv('QUEUE_SIZE', '64')))  # Bound on items waiting between pipeline stages
+    PIPELINE_STATS_INTERVAL = float(os.getenv('PIPELINE_STATS_INTERVAL', '0'))  # Seconds between stage stat printouts (0 = off)
+    TEXT_CACHE_DIR = os.getenv('TEXT_CACHE_DIR', os.path.join('.cache', 'text'))  # Extracted text, keyed by PDF content hash
+    WATCH_INTERVAL = float(os.getenv('WATCH_INTERVAL', '10'))  # Seconds between folder scans in watch mode
+    # Local BM25 pre-filter: only the best keyword matches are sent to the LLM (off when both are unset)
+    PREFILTER_TOP_K = int(os.getenv('PREFILTER_TOP_K')) if os.getenv('PREFILTER_TOP_K') else None
+    PREFILTER_MIN_SCORE = float(os.getenv('PREFILTER_MIN_SCORE')) if os.getenv('PREFILTER_MIN_SCORE') else None  # 0-1, relative to the best match
+    # Resume text is cleaned up and cut to a token budget before it is sent (0 = no limit)
+    COMPACT_TEXT = os.getenv('COMPACT_TEXT', 'True').lower() in ['true', '1', 't', 'yes']
+    RESUME_TOKEN_BUDGET = int(os.getenv('RESUME_TOKEN_BUDGET', '6000'))
+    # Ask for JSON matching a schema (response_format) instead of a name,score,reason line
+    STRUCTURED_OUTPUT = os.getenv('STRUCTURED_OUTPUT', 'False').lower() in ['true', '1', 't', 'yes']
+    # Score one resume per group of identical or near-identical ones and copy its score to the rest
+    DEDUPE = os.getenv('DEDUPE', 'True').lower() in ['true', '1', 't', 'yes']
+    DEDUPE_THRESHOLD = float(os.getenv('DEDUPE_THRESHOLD', '0.9'))  # Estimated text similarity (0-1) for a near duplicate
+    # Mark the shared prompt prefix for the provider's prompt cache: auto (models that need it), True or False
+    PROMPT_CACHE_HINTS = os.getenv('PROMPT_CACHE_HINTS', 'auto').lower()
+    # Model cascade: rescore the borderline candidates of the first pass with a stronger model (off when unset).
+    # Candidates are picked by their first-pass score: the top percent and/or a score band (default: top 20%)
+    CASCADE_MODEL = os.getenv('CASCADE_MODEL') or None
+    CASCADE_MIN_SCORE = float(os.getenv('CASCADE_MIN_SCORE')) if os.getenv('CASCADE_MIN_SCORE') else None
+    CASCADE_MAX_SCORE = float(os.getenv('CASCADE_MAX_SCORE')) if os.getenv('CASCADE_MAX_SCORE') else None
+    if os.getenv('CASCADE_TOP_PERCENT'):
+        CASCADE_TOP_PERCENT = float(os.getenv('CASCADE_TOP_PERCENT'))
+    else:
+        CASCADE_TOP_PERCENT = 20.0 if CASCADE_MIN_SCORE is None and CASCADE_MAX_SCORE is None else None
+    METRICS_FILE = os.getenv('METRICS_FILE')  # Optional OpenMetrics/Prometheus text file written after each run
+    DEBUG = os.getenv('DEBUG', 'False').lower() in ['true', '1', 't', 'yes']
+
+load_settings()
 
 # Ensure result folder exists
 os.makedirs(RESULT_FOLDER, exist_ok=True)
 
-# Function to extract text from PDF
-def extract_text_from_pdf(pdf_path):
-    with open(pdf_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        text = ''
-        for page in reader.pages:
-            text += page.extract_text()
-    return text
+# Files modified more recently than this are assumed to still be copying in watch mode
+WATCH_SETTLE_SECONDS = 2
 
 # Function to extract probable name from filename
 def extract_name_from_filename(filename):
@@ -159,14 +223,55 @@ def extract_name_from_filename(filename):
 def read_job_description(job_desc_path):
     with open(job_desc_path, 'r') as file:
         job_desc = file.read()
-    return job_desc
+    return normalize_whitespace(job_desc) if COMPACT_TEXT else job_desc
 
-# Function to process a single resume
-def process_resume(filename, resume_text, job_desc, additional_criteria=None):
-    # Extract probable name from filename for verification
-    probable_name = extract_name_from_filename(filename)
-    
-    system_message = """You are a resume scorer. Score each resume based on the provided job description. The score is on the scale of 0-100. The score can be in decimal.
+# Function to shrink extracted resume text before it is sent to the model
+def prepare_resume_text(resume_file, resume_text):
+    """Return (text to send, compaction stats or None when COMPACT_TEXT is off)"""
+    if not COMPACT_TEXT:
+        return resume_text.replace('\f', '\n'), None
+    compacted, stats = compact_resume_text(resume_text, RESUME_TOKEN_BUDGET)
+    if DEBUG: print(f"DEBUG: Compacted {resume_file} from {stats['tokens_before']} to {stats['tokens_after']} tokens"
+                    f"{' (truncated)' if stats['truncated'] else ''}")
+    return compacted, stats
+
+# Function to load the job description(s) to score against
+def load_jobs(all_jobs=False, with_descriptions=True):
+    """Return a list of jobs, each a dict with its name, description and result folder.
+
+    By default this is the single job_descriptions/job_description.md, scored into
+    RESULT_FOLDER. With all_jobs, every .md file in JOB_DESC_FOLDER is a job with its
+    own subfolder of RESULT_FOLDER.
+    """
+    if not all_jobs:
+        job_desc_path = os.path.join(JOB_DESC_FOLDER, 'job_description.md')
+        if not os.path.exists(job_desc_path):
+            print(f"Job description file not found at: {job_desc_path}")
+            print(f"Please create a job description file at this location and try again.")
+            return []
+        jobs = [{'name': 'job_description', 'path': job_desc_path, 'result_folder': RESULT_FOLDER}]
+    else:
+        job_files = sorted(f for f in os.listdir(JOB_DESC_FOLDER) if f.endswith('.md'))
+        if not job_files:
+            print(f"No job description (.md) files found in: {JOB_DESC_FOLDER}")
+            return []
+        jobs = [
+            {
+                'name': os.path.splitext(job_file)[0],
+                'path': os.path.join(JOB_DESC_FOLDER, job_file),
+                'result_folder': os.path.join(RESULT_FOLDER, os.path.splitext(job_file)[0])
+            }
+            for job_file in job_files
+        ]
+
+    if with_descriptions:
+        for job in jobs:
+            job['description'] = read_job_description(job['path'])
+            if DEBUG: print(f"DEBUG: Loaded job description from {job['path']}, length: {len(job['description'])}")
+    return jobs
+
+# Instructions for scoring one resume per request
+SCORING_SYSTEM_MESSAGE = """You are a resume scorer. Score each resume based on the provided job description. The score is on the scale of 0-100. The score can be in decimal.
 
 IMPORTANT - Your response format must be EXACTLY:
 name,score,reason
@@ -181,61 +286,214 @@ Example incorrect format: "Good skills in database management John Smith,87.5,St
 
 DO NOT add any commentary, explanations, or notes outside this strict format. Keep the reason brief and to the point."""
 
-    # If we have a probable name from the filename, include it for verification
-    user_content = f"""Job Description: {job_desc}
+# Instructions for scoring several resumes per request (BATCH_SIZE > 1)
+BATCH_SCORING_SYSTEM_MESSAGE = """You are a resume scorer. Score each resume based on the provided job description. The score is on the scale of 0-100. The score can be in decimal.
 
-Filename: {filename}
-Probable name from filename: {probable_name}
+You will receive several resumes, each introduced by its filename. Score every resume independently.
 
-Resume Text:
-{resume_text}"""
+IMPORTANT - Your response must be EXACTLY one JSON object keyed by filename, with no other text:
+{"<filename>": {"name": "<candidate name>", "score": <score>, "reason": "<reason>"}}
+
+Where:
+- '<filename>' is the filename exactly as given, and every filename must appear once
+- 'name' is ONLY the candidate's name with no other commentary
+- 'score' is just the numeric score (e.g., 87.5)
+- 'reason' is EXACTLY ONE SHORT SENTENCE explaining the key factor in your decision
+
+Example correct format: {"john_smith_cv.pdf": {"name": "John Smith", "score": 87.5, "reason": "Strong technical skills that match the job requirements"}}
+
+DO NOT add any commentary, explanations, markdown or notes outside this JSON object."""
+
+# Instructions for scoring one resume per request in structured output mode (STRUCTURED_OUTPUT)
+STRUCTURED_SCORING_SYSTEM_MESSAGE = """You are a resume scorer. Score each resume based on the provided job description. The score is on the scale of 0-100. The score can be in decimal.
+
+Respond with a single JSON object with these fields:
+- "name": ONLY the candidate's name with no other commentary
+- "score": the numeric score (e.g., 87.5)
+- "reason": EXACTLY ONE SHORT SENTENCE explaining the key factor in your decision
+
+Example: {"name": "John Smith", "score": 87.5, "reason": "Strong technical skills that match the job requirements"}"""
+
+# JSON schema the structured output reply must match
+SCORE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string', 'description': "The candidate's name only"},
+        'score': {'type': 'number', 'description': 'Score from 0 to 100'},
+        'reason': {'type': 'string', 'description': 'One short sentence'},
+    },
+    'required': ['name', 'score', 'reason'],
+    'additionalProperties': False,
+}
 
-    # Add additional criteria if provided
-    additional_content = ""
+# Instructions for turning a malformed reply into a valid one without resending the resume
+REFORMAT_SYSTEM_MESSAGE = """You convert a resume scorer's reply into a JSON object {"name": "<candidate name>", "score": <0-100>, "reason": "<one short sentence>"}.
+Use only information found in the reply. If the reply doesn't contain both a candidate name and a score, return {}."""
+
+def scoring_system_message():
+    return STRUCTURED_SCORING_SYSTEM_MESSAGE if STRUCTURED_OUTPUT else SCORING_SYSTEM_MESSAGE
+
+def scoring_response_format():
+    """The response_format for single resume requests, or None in the default text mode"""
+    if not STRUCTURED_OUTPUT:
+        return None
+    return {'type': 'json_schema', 'json_schema': {'name': 'resume_score', 'strict': True, 'schema': SCORE_SCHEMA}}
+
+# Providers that only reuse a cached prompt prefix when it is marked with cache_control; others do it automatically
+CACHE_CONTROL_MODEL_PREFIXES = ('anthropic/', 'google/gemini')
+
+def scoring_model(model=None):
+    """The model to score with: model if given (e.g. the cascade's second tier), else OPENROUTER_MODEL"""
+    return model or os.environ.get('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
+
+def prompt_cache_hints(model=None):
+    """Whether to add cache_control to the shared prompt prefix (PROMPT_CACHE_HINTS)"""
+    if PROMPT_CACHE_HINTS == 'auto':
+        return scoring_model(model).startswith(CACHE_CONTROL_MODEL_PREFIXES)
+    return PROMPT_CACHE_HINTS in ['true', '1', 't', 'yes']
+
+@functools.lru_cache(maxsize=32)
+def scoring_prompt_prefix(system_message, job_desc, additional_criteria, batch, cache_hints):
+    """Return (system message, first user content part) shared by every scoring request for a job.
+
+    Built once and reused as is, so every request starts with byte-identical instructions,
+    job description and criteria that providers can serve from their prompt cache. The
+    per-resume part follows it. Callers must not modify the returned dicts.
+    """
+    shared = f"Job Description: {job_desc}\n"
     if additional_criteria and additional_criteria.strip():
-        additional_content = f"""
+        if batch:
+            output_format = 'return the EXACT JSON object specified in the system instructions'
+        elif STRUCTURED_OUTPUT:
+            output_format = ('follow the EXACT output format specified in the system instructions (a JSON object):\n'
+                             '"name", "score" and "reason" with the name being exactly the candidate\'s name from the resume')
+        else:
+            output_format = ('follow the EXACT output format specified in the system instructions:\n'
+                             '"name,score,reason" with the name being exactly the candidate\'s name from the resume')
+        shared += f"""
 Additional prioritization note: {additional_criteria}
 
-IMPORTANT: The above is ONLY for consideration in scoring. You must STILL follow the EXACT output format specified in the system instructions:
-"name,score,reason" with the name being exactly the candidate's name from the resume.
+IMPORTANT: The above is ONLY for consideration in scoring. You must STILL {output_format}.
 """
+    shared_part = {'type': 'text', 'text': shared}
+    if cache_hints:
+        shared_part['cache_control'] = {'type': 'ephemeral'}
+    return {'role': 'system', 'content': system_message}, shared_part
+
+def scoring_messages(system_message, job_desc, additional_criteria, resume_content, batch=False, model=None):
+    """The shared prefix followed by the per-resume content"""
+    system, shared_part = scoring_prompt_prefix(system_message, job_desc, additional_criteria or '', batch, prompt_cache_hints(model))
+    return [system, {'role': 'user', 'content': [shared_part, {'type': 'text', 'text': resume_content}]}]
+
+# Function to build the response cache key for one resume; the filename is deliberately left out
+# so renamed or duplicated files reuse earlier scores
+def scoring_cache_key(system_message, resume_text, job_desc, additional_criteria=None, model=None):
+    return make_cache_key('score', scoring_model(model), system_message, job_desc, (additional_criteria or '').strip(), resume_text)
+
+# Function to process a single resume
+def process_resume(filename, resume_text, job_desc, additional_criteria=None, trace=None, model=None):
+    trace = trace or NULL_TRACE
+    # Reuse an earlier response for the same model, prompts and resume text
+    cache = get_response_cache()
+    system_message = scoring_system_message()
+    cache_key = scoring_cache_key(system_message, resume_text, job_desc, additional_criteria, model)
+    cached_response = cache.get(cache_key)
+    if cached_response is not None:
+        if DEBUG: print(f"DEBUG: Using cached response for {filename}")
+        trace.mark_cached()
+        return cached_response
+    prompt_started = time.monotonic()
+
+    # Extract probable name from filename for verification
+    probable_name = extract_name_from_filename(filename)
+
+    # Everything specific to this resume goes after the shared prefix
+    resume_content = f"""Filename: {filename}
+Probable name from filename: {probable_name}
+
+Resume Text:
+{resume_text}"""
     
-    user_content += additional_content
-    
-    headers = {
-        'Authorization': f'Bearer {os.environ.get("OPENROUTER_API_KEY")}',
-        'Content-Type': 'application/json'
+    data = {
+        'model': scoring_model(model),
+        'messages': scoring_messages(system_message, job_desc, additional_criteria, resume_content, model=model),
     }
+    if STRUCTURED_OUTPUT:
+        data['response_format'] = scoring_response_format()
+    
+    trace.add_time('prompt', time.monotonic() - prompt_started)
     
+    stats = {}
+    with trace.timer('api'):
+        response = post_chat_completion(data, os.environ.get("OPENROUTER_API_KEY"), max_retries=MAX_RETRIES,
+                                        verbose=DEBUG, label=f"resume {filename}", stats=stats)
+    trace.add_response(response, data['model'], stats.get('attempts', 1))
+    cache.set(cache_key, response)
+    return response
+
+# Function to process several resumes in a single request (BATCH_SIZE > 1)
+def process_resume_batch(resumes, job_desc, additional_criteria=None, trace=None):
+    """Score a list of (filename, resume_text) pairs with one API call"""
+    trace = trace or NULL_TRACE
+    prompt_started = time.monotonic()
+    resume_content = ''
+    for filename, resume_text in resumes:
+        resume_content += f"""
+=== Resume ===
+Filename: {filename}
+Probable name from filename: {extract_name_from_filename(filename)}
+
+Resume Text:
+{resume_text}
+"""
+
     data = {
         'model': os.environ.get('OPENROUTER_MODEL', 'openai/gpt-4o-mini'),
-        'messages': [
-            {
-                'role': 'system',
-                'content': system_message
-            },
-            {
-                'role': 'user',
-                'content': user_content
-            }
-        ]
+        'messages': scoring_messages(BATCH_SCORING_SYSTEM_MESSAGE, job_desc, additional_criteria, resume_content, batch=True),
     }
-    
-    for attempt in range(MAX_RETRIES):
-        try:
-            if DEBUG: print(f"DEBUG: Sending resume {filename} to API (attempt {attempt + 1})")
-            response = requests.post('https://openrouter.ai/api/v1/chat/completions', headers=headers, json=data)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            if DEBUG: print(f"DEBUG: API call attempt {attempt + 1} failed with error: {e}")
-            if attempt < MAX_RETRIES - 1:
-                wait_time = 2 ** attempt  # Exponential backoff
-                if DEBUG: print(f"DEBUG: Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print(f"ERROR: API call failed after {MAX_RETRIES} attempts. Stopping the program.")
-                raise
+    if STRUCTURED_OUTPUT:
+        # The reply is keyed by filename, which a strict schema can't express, so only ask for valid JSON
+        data['response_format'] = {'type': 'json_object'}
+
+    trace.add_time('prompt', time.monotonic() - prompt_started)
+
+    stats = {}
+    with trace.timer('api'):
+        response = post_chat_completion(data, os.environ.get("OPENROUTER_API_KEY"), max_retries=MAX_RETRIES,
+                                        verbose=DEBUG, label=f"batch of {len(resumes)} resumes", stats=stats)
+    trace.add_response(response, data['model'], stats.get('attempts', 1))
+    return response
+
+# Function to pull a JSON object out of a reply, tolerating markdown code fences or stray text around it
+def decode_json_object(raw_response):
+    start, end = raw_response.find('{'), raw_response.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        entry = json.loads(raw_response[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return entry if isinstance(entry, dict) else None
+
+# Function to check a decoded score object against SCORE_SCHEMA
+def validate_score_fields(entry):
+    """Return (name, score, reason) from a score object, or raise ValueError if it doesn't fit the schema"""
+    if not isinstance(entry, dict):
+        raise ValueError(f"expected an object, got {type(entry).__name__}")
+    name = entry.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("missing candidate name")
+    score = entry.get('score')
+    if isinstance(score, bool) or not isinstance(score, (int, float, str)):
+        raise ValueError(f"invalid score {score!r}")
+    score = float(score)
+    if not 0 <= score <= 100:
+        raise ValueError(f"score {score} is outside 0-100")
+    reason = entry.get('reason', '')
+    return name.strip(), score, str(reason if reason is not None else '').strip()
+
+# A reply that is a JSON object, possibly inside a markdown code fence
+JSON_REPLY_PATTERN = re.compile(r'^(```(json)?\s*)?\{')
 
 # Function to parse and validate a single result
 def parse_result(response_json, filename):
@@ -243,15 +501,21 @@ def parse_result(response_json, filename):
         if DEBUG: print(f"DEBUG: No choices in API response for {filename}")
         return None
         
-    raw_response = response_json['choices'][0]['message']['content'].strip()
+    raw_response = (response_json['choices'][0]['message']['content'] or '').strip()
     if DEBUG: print(f"DEBUG: Raw response for {filename}: {raw_response}")
     
+    # Structured output mode (and repaired replies) return a JSON object
+    entry = decode_json_object(raw_response) if JSON_REPLY_PATTERN.match(raw_response) else None
+    if entry is not None:
+        try:
+            return build_result_data(*validate_score_fields(entry), filename)
+        except ValueError as e:
+            if DEBUG: print(f"DEBUG: Invalid JSON result for {filename}: {e}")
+            return None
+    
     # Handle multi-line responses by joining them
     raw_response = raw_response.replace('\n', ' ').strip()
     
-    # Extract probable name from filename for verification
-    probable_name = extract_name_from_filename(filename)
-    
     try:
         # Split by the first two commas to get name, score, and reason
         first_comma = raw_response.find(',')
@@ -283,40 +547,117 @@ def parse_result(response_json, filename):
             if DEBUG: print(f"DEBUG: Error converting score '{score_str}' to float: {e}")
             return None
         
-        # Verify the name makes sense
-        if len(candidate_name.split()) > 5:
-            if DEBUG: print(f"DEBUG: Name too long, likely contains extra text: {candidate_name}")
-            # Try to clean it up
-            candidate_name = ' '.join(candidate_name.split()[-3:])  # Take last 3 words as name
-            if DEBUG: print(f"DEBUG: Shortened to: {candidate_name}")
-        
-        # Check if extracted name is significantly different from filename
-        probable_words = set(w.lower() for w in probable_name.split() if len(w) > 2)
-        candidate_words = set(w.lower() for w in candidate_name.split() if len(w) > 2)
-        
-        # If we have words to compare and there's minimal overlap
-        if probable_words and candidate_words and not probable_words.intersection(candidate_words):
-            print(f"WARNING: Extracted name '{candidate_name}' doesn't match filename '{filename}'")
-            print(f"Probable name from filename: {probable_name}")
-            use_filename = input(f"Use name from filename instead? (y/n): ").strip().lower()
-            if use_filename == 'y':
-                candidate_name = probable_name
-                if DEBUG: print(f"DEBUG: Using filename-based name: {candidate_name}")
-            
-        result_data = {
-            'id': str(uuid.uuid4()),
-            'name': candidate_name,
-            'score': score,
-            'reason': reason,
-            'original_filename': filename
-        }
-        
-        return result_data
+        return build_result_data(candidate_name, score, reason, filename)
         
     except Exception as e:
         if DEBUG: print(f"DEBUG: Error processing response for {filename}: {raw_response}. Error: {e}")
         return None
 
+# Function to split a batch response into per-resume results
+def parse_batch_result(response_json, filenames):
+    """Return {filename: result_data} for every filename the batch response scored correctly"""
+    if not response_json.get('choices'):
+        if DEBUG: print(f"DEBUG: No choices in API response for batch {filenames}")
+        return {}
+
+    raw_response = (response_json['choices'][0]['message']['content'] or '').strip()
+    if DEBUG: print(f"DEBUG: Raw batch response for {filenames}: {raw_response}")
+
+    entries = decode_json_object(raw_response)
+    if entries is None:
+        if DEBUG: print("DEBUG: No valid JSON object in batch response")
+        return {}
+
+    results = {}
+    for filename in filenames:
+        if filename not in entries:
+            if DEBUG: print(f"DEBUG: Batch response is missing {filename}")
+            continue
+        try:
+            fields = validate_score_fields(entries[filename])
+        except ValueError as e:
+            if DEBUG: print(f"DEBUG: Invalid batch entry for {filename}: {entries[filename]}. Error: {e}")
+            continue
+        results[filename] = build_result_data(*fields, filename)
+    return results
+
+# Function to recover name, score and reason from a reply that is almost valid JSON (cut off, unescaped quotes...)
+SALVAGE_PATTERNS = {
+    'name': re.compile(r'"name"\s*:\s*"([^"\n]+)"'),
+    'score': re.compile(r'"score"\s*:\s*"?(-?\d+(?:\.\d+)?)'),
+    'reason': re.compile(r'"reason"\s*:\s*"([^\n]*?)(?:"\s*[,}\n]|"?\s*$)'),
+}
+
+def salvage_score_fields(raw_response):
+    """Return (name, score, reason) found in a malformed reply, or None"""
+    entry = decode_json_object(raw_response)
+    if entry is None:
+        entry = {}
+        for field, pattern in SALVAGE_PATTERNS.items():
+            match = pattern.search(raw_response)
+            if match:
+                entry[field] = match.group(1)
+    try:
+        return validate_score_fields(entry)
+    except ValueError:
+        return None
+
+# Function to validate the candidate name against the filename and build the result record
+def build_result_data(candidate_name, score, reason, filename):
+    # Extract probable name from filename for verification
+    probable_name = extract_name_from_filename(filename)
+
+    # Verify the name makes sense
+    if len(candidate_name.split()) > 5:
+        if DEBUG: print(f"DEBUG: Name too long, likely contains extra text: {candidate_name}")
+        # Try to clean it up
+        candidate_name = ' '.join(candidate_name.split()[-3:])  # Take last 3 words as name
+        if DEBUG: print(f"DEBUG: Shortened to: {candidate_name}")
+    
+    # Check if extracted name is significantly different from filename
+    probable_words = set(w.lower() for w in probable_name.split() if len(w) > 2)
+    candidate_words = set(w.lower() for w in candidate_name.split() if len(w) > 2)
+    
+    result_data = {
+        'id': str(uuid.uuid4()),
+        'name': candidate_name,
+        'score': score,
+        'reason': reason,
+        'original_filename': filename
+    }
+    
+    # If we have words to compare and there's minimal overlap, record it for review after the run
+    # instead of blocking a scoring worker on input()
+    if probable_words and candidate_words and not probable_words.intersection(candidate_words):
+        print(f"WARNING: Extracted name '{candidate_name}' doesn't match filename '{filename}'")
+        result_data['name_mismatch'] = True
+        result_data['filename_name'] = probable_name
+    
+    return result_data
+
+# Function to let the user settle name mismatches recorded during scoring
+def review_name_mismatches(result_folder):
+    mismatches = [result for result in get_ranking_index(result_folder).ranked() if result.get('name_mismatch')]
+    if not mismatches:
+        return
+    
+    print(f"\n{len(mismatches)} extracted names don't match their filenames.")
+    for result_data in mismatches:
+        print(f"\nFile: {result_data['original_filename']}")
+        print(f"Extracted name: {result_data['name']}")
+        print(f"Probable name from filename: {result_data['filename_name']}")
+        use_filename = input(f"Use name from filename instead? (y/n, Enter to decide later): ").strip().lower()
+        if use_filename not in ('y', 'n'):
+            continue
+        if use_filename == 'y':
+            result_data['name'] = result_data['filename_name']
+            if DEBUG: print(f"DEBUG: Using filename-based name: {result_data['name']}")
+        del result_data['name_mismatch']
+        save_result(result_data, result_folder)
+    
+    # Names may have changed, so refresh the final results
+    aggregate_and_save_results(result_folder)
+
 # Function to save a single result
 def save_result(result_data, result_folder):
     if not result_data:
@@ -326,16 +667,390 @@ def save_result(result_data, result_folder):
     base_filename = os.path.splitext(result_data['original_filename'])[0]
     result_file = os.path.join(result_folder, f'{base_filename}.json')
     
-    with open(result_file, 'w') as f:
+    # Written atomically so a crash never leaves a truncated result behind
+    with atomic_write(result_file) as f:
         json.dump(result_data, f, indent=4)
     
+    # Keep the ranking index in step so aggregation doesn't need to rescan the folder
+    get_ranking_index(result_folder).upsert(base_filename, result_data)
+    # and the cross-requisition candidate index used by the interview generator
+    get_candidate_index().upsert(result_folder, result_data)
+    
     if DEBUG: print(f"DEBUG: Saved result for {result_data['name']} in {result_file}")
     return result_file
 
+# Function to keep a copy of the extracted text next to the results (read by the interview generator)
+def save_resume_text(resume_file, resume_text, result_folder):
+    # Only called for resumes being (re)scored, so overwrite any text from an older version of the file
+    result_text_file = os.path.join(result_folder, f'{resume_file}.txt')
+    with atomic_write(result_text_file) as f:
+        f.write(resume_text)
+
+# Function to load a saved result, or None if it is missing or incomplete (results from before atomic writes may be truncated)
+def read_result(result_file):
+    try:
+        with open(result_file, 'r') as f:
+            result = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return result if isinstance(result, dict) and 'score' in result else None
+
+# Function to give a duplicate resume its representative's score
+def build_duplicate_result(representative_result, filename, similarity, match):
+    result_data = build_result_data(representative_result['name'], representative_result['score'],
+                                    representative_result['reason'], filename)
+    # Point at the resume that was actually scored, even if the representative is itself a copy
+    result_data['duplicate_of'] = representative_result.get('duplicate_of') or representative_result['original_filename']
+    result_data['duplicate_similarity'] = round(similarity, 3)
+    result_data['duplicate_match'] = match
+    result_data['model'] = representative_result.get('model')
+    return result_data
+
+# Function to read the first (cheapest) tier's score of a result, escalated or not
+def first_tier_score(result_data):
+    tiers = result_data.get('tiers')
+    return float(tiers[0]['score'] if tiers else result_data['score'])
+
+# Function to pick the results of a folder the cascade model should rescore
+def select_for_escalation(results, model, top_percent=None, min_score=None, max_score=None):
+    """Return the results (not yet rescored by model) in the top percent and/or score band of the first tier.
+
+    Copies of a duplicate group follow their representative, so only representatives are selected.
+    When several limits are set a result has to satisfy all of them.
+    """
+    candidates = sorted((result for result in results if not result.get('duplicate_of')),
+                        key=first_tier_score, reverse=True)
+    if top_percent is not None:
+        candidates = candidates[:math.ceil(len(candidates) * top_percent / 100)]
+    return [
+        result for result in candidates
+        if (min_score is None or first_tier_score(result) >= min_score)
+        and (max_score is None or first_tier_score(result) <= max_score)
+        and result.get('model') != model
+    ]
+
+# Function to record a stronger model's score on top of the first tier's
+def merge_cascade_result(result_data, escalated, model):
+    """Return result_data with both tiers under 'tiers' and the final tier's score, reason and model on top"""
+    merged = dict(result_data)
+    first_tier = (result_data.get('tiers') or [{
+        'model': result_data.get('model'), 'score': result_data['score'], 'reason': result_data.get('reason'),
+    }])[0]
+    merged['tiers'] = [first_tier, {'model': model, 'score': escalated['score'], 'reason': escalated['reason']}]
+    # The ranking, exports and duplicates all use the final tier
+    merged['score'] = escalated['score']
+    merged['reason'] = escalated['reason']
+    merged['model'] = model
+    return merged
+
+# Function to build a result folder's duplicate index from the resumes scored in earlier runs
+def load_duplicate_index(manifest):
+    index = DuplicateIndex(DEDUPE_THRESHOLD)
+    scored = manifest.scored()
+    # Resumes scored before duplicate detection existed have no signature and only match exact copies
+    signatures = get_signature_store().get_many({content_hash for _, _, content_hash, _ in scored.values()})
+    for filename, (_, _, content_hash, _) in sorted(scored.items()):
+        index.add(filename, content_hash, signatures.get(content_hash))
+    return index
+
+# Function to list the resumes an interrupted or failed earlier run left unfinished
+def find_unfinished_resumes(jobs, resume_folder):
+    """Yield (resume_file, stat, content_hash, job_names) for resumes whose manifest state isn't final.
+
+    Comes straight from the manifests, so no folder scan or hashing is needed. Files
+    changed or removed since the manifest entry was written are left to the folder scan.
+    """
+    unfinished = {}
+    for job in jobs:
+        for resume_file, (size, mtime_ns, content_hash, _) in job['manifest'].unfinished().items():
+            unfinished.setdefault(resume_file, []).append((job['name'], size, mtime_ns, content_hash))
+    for resume_file in sorted(unfinished):
+        try:
+            stat = os.stat(os.path.join(resume_folder, resume_file))
+        except FileNotFoundError:
+            continue
+        matching = [(job_name, content_hash) for job_name, size, mtime_ns, content_hash in unfinished[resume_file]
+                    if size == stat.st_size and mtime_ns == stat.st_mtime_ns]
+        if matching:
+            yield resume_file, stat, matching[0][1], [job_name for job_name, _ in matching]
+
+# Function to queue the resumes whose result file was deleted since they were scored
+def requeue_missing_results(manifest, result_folder):
+    """Set scored resumes without a result file back to pending and drop them from the ranking until then.
+
+    One scan of the result folder is compared against the manifest, so no file is checked
+    on its own. Returns the number of resumes queued again.
+    """
+    with os.scandir(result_folder) as entries:
+        result_files = {entry.name for entry in entries if entry.name.endswith('.json')}
+    missing = [filename for filename in manifest.scored()
+               if f'{os.path.splitext(filename)[0]}.json' not in result_files]
+    for filename in missing:
+        if DEBUG: print(f"DEBUG: Result for {filename} is missing, rescoring it")
+        get_ranking_index(result_folder).delete(os.path.splitext(filename)[0])
+        manifest.set_state(filename, STATE_PENDING)
+    return len(missing)
+
+# Function to decide from the manifest whether a resume needs scoring
+def check_resume_changes(manifest, entry, result_folder, hash_memo=None, done_states=(STATE_SCORED,)):
+    """Return the content hash of a new or changed resume, or None if it can be skipped.
+
+    Only files whose size or mtime differ from the manifest are hashed, and a file
+    whose hash still matches (e.g. it was just touched) is not rescored. Pass the same
+    hash_memo dict when checking one file against several manifests to hash it once.
+    done_states are the manifest states that need nothing more while the file is
+    unchanged; the pre-filter adds STATE_FILTERED.
+    """
+    hash_memo = {} if hash_memo is None else hash_memo
+
+    def content_sha256():
+        if entry.path not in hash_memo:
+            hash_memo[entry.path] = file_sha256(entry.path)
+        return hash_memo[entry.path]
+
+    stat = entry.stat()
+    known = manifest.get(entry.name)
+    if known is not None:
+        size, mtime_ns, known_hash, state = known
+        if state in done_states and size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+            return None
+        content_hash = content_sha256()
+        if state in done_states and content_hash == known_hash:
+            manifest.record(entry.name, stat.st_size, stat.st_mtime_ns, content_hash, state)
+            return None
+        if DEBUG and state == STATE_SCORED: print(f"DEBUG: {entry.name} was modified since it was scored")
+    else:
+        content_hash = content_sha256()
+        # Results scored before the manifest existed are adopted rather than rescored
+        base_filename = os.path.splitext(entry.name)[0]
+        if read_result(os.path.join(result_folder, f'{base_filename}.json')) is not None:
+            manifest.record(entry.name, stat.st_size, stat.st_mtime_ns, content_hash, STATE_SCORED)
+            return None
+
+    manifest.record(entry.name, stat.st_size, stat.st_mtime_ns, content_hash, STATE_PENDING)
+    return content_hash
+
+# Function to score a single resume (runs inside a worker thread)
+def score_resume_file(resume_file, resume_text, job_desc, additional_criteria=None, trace=None, model=None):
+    trace = trace or NULL_TRACE
+    # Process single resume
+    response = process_resume(resume_file, resume_text, job_desc, additional_criteria, trace, model)
+
+    # Parse the result
+    with trace.timer('parse'):
+        result_data = parse_result(response, resume_file)
+
+    if not result_data:
+        # Don't let a malformed response be served from the cache next time, and fix it now rather than next run
+        get_response_cache().delete(scoring_cache_key(scoring_system_message(), resume_text, job_desc, additional_criteria, model))
+        result_data = repair_result(response, resume_file, resume_text, job_desc, additional_criteria, trace, model)
+
+    return result_data
+
+# Function to get the text of a chat completion reply
+def reply_text(response_json):
+    choices = response_json.get('choices') or [{}]
+    return ((choices[0].get('message') or {}).get('content') or '').strip()
+
+# Function to ask the model to reformat a malformed reply; only the reply is sent, not the resume
+def reformat_reply(raw_response, resume_file, trace=None):
+    """Return (name, score, reason) from the reformatted reply, or None"""
+    trace = trace or NULL_TRACE
+    data = {
+        'model': os.environ.get('OPENROUTER_MODEL', 'openai/gpt-4o-mini'),
+        'messages': [
+            {'role': 'system', 'content': REFORMAT_SYSTEM_MESSAGE},
+            {'role': 'user', 'content': raw_response}
+        ]
+    }
+    if STRUCTURED_OUTPUT:
+        # Not the strict schema: the model must be able to answer {} when the reply holds no score
+        data['response_format'] = {'type': 'json_object'}
+    stats = {}
+    with trace.timer('api'):
+        response = post_chat_completion(data, os.environ.get("OPENROUTER_API_KEY"), max_retries=MAX_RETRIES,
+                                        verbose=DEBUG, label=f"reformat of {resume_file}", stats=stats)
+    trace.add_response(response, data['model'], stats.get('attempts', 1))
+    return salvage_score_fields(reply_text(response))
+
+# Function to recover from a malformed reply for one resume
+def repair_result(response_json, resume_file, resume_text, job_desc, additional_criteria=None, trace=None, model=None):
+    """Salvage the reply locally, else have the model reformat it, else score the resume once more.
+
+    Returns result_data, or None if the resume still couldn't be scored.
+    """
+    trace = trace or NULL_TRACE
+    trace.mark_repaired()
+    cache = get_response_cache()
+    cache_key = scoring_cache_key(scoring_system_message(), resume_text, job_desc, additional_criteria, model)
+    raw_response = reply_text(response_json)
+
+    with trace.timer('parse'):
+        fields = salvage_score_fields(raw_response)
+    if fields is None and raw_response:
+        try:
+            fields = reformat_reply(raw_response, resume_file, trace)
+        except RetryableAPIError as e:
+            if DEBUG: print(f"DEBUG: Could not reformat the reply for {resume_file}: {e}")
+    if fields is not None:
+        if DEBUG: print(f"DEBUG: Repaired the reply for {resume_file}")
+        name, score, reason = fields
+        # Cache the repaired reply so later runs reuse it
+        cache.set(cache_key, {'choices': [{'message': {'content': json.dumps({'name': name, 'score': score, 'reason': reason})}}]})
+        return build_result_data(name, score, reason, resume_file)
+
+    # Last resort: score the resume from scratch once more (the bad reply is no longer cached)
+    if DEBUG: print(f"DEBUG: Rescoring {resume_file} after a malformed reply")
+    response = process_resume(resume_file, resume_text, job_desc, additional_criteria, trace, model)
+    with trace.timer('parse'):
+        result_data = parse_result(response, resume_file)
+    if not result_data:
+        cache.delete(cache_key)
+    return result_data
+
+# Function to score a batch of resumes, splitting it up if the response comes back malformed
+def score_resume_batch(resumes, job_desc, additional_criteria=None, traces=None):
+    """Score a list of (resume_file, resume_text) pairs and return {resume_file: result_data or None}
+
+    If traces ({resume_file: ResumeTrace}) is given, each resume's share of the work is recorded in it.
+    """
+    traces = traces or {}
+    if len(resumes) == 1:
+        resume_file, resume_text = resumes[0]
+        return {resume_file: score_resume_file(resume_file, resume_text, job_desc, additional_criteria, traces.get(resume_file))}
+
+    cache = get_response_cache()
+    results = {}
+    uncached = []
+    cache_keys = {}
+    for resume_file, resume_text in resumes:
+        cache_keys[resume_file] = scoring_cache_key(BATCH_SCORING_SYSTEM_MESSAGE, resume_text, job_desc, additional_criteria)
+        entry = cache.get(cache_keys[resume_file])
+        if entry is not None:
+            if DEBUG: print(f"DEBUG: Using cached score for {resume_file}")
+            results[resume_file] = build_result_data(entry['name'], entry['score'], entry['reason'], resume_file)
+            traces.get(resume_file, NULL_TRACE).mark_cached()
+        else:
+            uncached.append((resume_file, resume_text))
+
+    if uncached:
+        # Time and tokens of the shared request are split evenly between its resumes
+        batch_trace = ResumeTrace()
+        batch_trace.batch_size = len(uncached)
+        try:
+            response = process_resume_batch(uncached, job_desc, additional_criteria, batch_trace)
+            with batch_trace.timer('parse'):
+                batch_results = parse_batch_result(response, [resume_file for resume_file, _ in uncached])
+        finally:
+            for resume_file, _ in uncached:
+                traces.get(resume_file, NULL_TRACE).merge(batch_trace, 1 / len(uncached))
+        for resume_file, result_data in batch_results.items():
+            cache.set(cache_keys[resume_file], {
+                'name': result_data['name'],
+                'score': result_data['score'],
+                'reason': result_data['reason']
+            })
+        results.update(batch_results)
+
+    # Retry whatever the model dropped or garbled as two smaller batches
+    missing = [(resume_file, resume_text) for resume_file, resume_text in resumes if resume_file not in results]
+    if missing:
+        if DEBUG: print(f"DEBUG: Batch response missed {len(missing)} of {len(resumes)} resumes, retrying them in smaller batches")
+        middle = (len(missing) + 1) // 2
+        for part in (missing[:middle], missing[middle:]):
+            if part:
+                results.update(score_resume_batch(part, job_desc, additional_criteria, traces))
+
+    return results
+
+# Function to parse command line options
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Score resume PDFs against a job description using an LLM.')
+    parser.add_argument('--non-interactive', action='store_true',
+                        help='never prompt; take settings from the environment, --config and these options')
+    parser.add_argument('--config', help='settings file in .env format, applied on top of .env')
+    parser.add_argument('--api-key', help='OpenRouter API key (not saved to .env)')
+    parser.add_argument('--model', help='OpenRouter model name (not saved to .env)')
+    parser.add_argument('--criteria', help='additional prioritization criteria')
+    parser.add_argument('--resume-folder', help='folder containing resume PDFs')
+    parser.add_argument('--job-desc-folder', help='folder containing job_description.md')
+    parser.add_argument('--result-folder', help='folder for results')
+    parser.add_argument('--batch-size', type=int, help='resumes per API request')
+    parser.add_argument('--concurrency', type=int, help='API requests in flight at once')
+    parser.add_argument('--all-jobs', action='store_true',
+                        help='score every resume against every .md job description in the job description folder')
+    parser.add_argument('--prefilter-top-k', type=int,
+                        help='only send the K best keyword (BM25) matches per job to the LLM')
+    parser.add_argument('--prefilter-min-score', type=float,
+                        help='only send resumes whose keyword match is at least this fraction (0-1) of the best match')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and score new PDFs as they appear in the resume folder')
+    parser.add_argument('--watch-interval', type=float, help='seconds between folder scans in watch mode')
+    parser.add_argument('--structured-output', action='store_true',
+                        help='request JSON schema structured output from the model (STRUCTURED_OUTPUT)')
+    parser.add_argument('--metrics-file', help='also write run metrics in OpenMetrics (Prometheus) text format to this file')
+    parser.add_argument('--no-dedupe', action='store_true',
+                        help='score every resume, even identical or near-identical copies of another (DEDUPE=False)')
+    parser.add_argument('--cascade-model',
+                        help='rescore the borderline candidates of each run with this stronger model (CASCADE_MODEL)')
+    parser.add_argument('--cascade-top-percent', type=float,
+                        help='with --cascade-model, rescore the top N percent of first-pass scores (default 20 without a band)')
+    parser.add_argument('--cascade-min-score', type=float, help='with --cascade-model, rescore first-pass scores from this one')
+    parser.add_argument('--cascade-max-score', type=float, help='with --cascade-model, rescore first-pass scores up to this one')
+    parser.add_argument('--ingest', action='append', metavar='SOURCE',
+                        help='take resumes from this folder or zip archive (nested ones too): valid PDFs are copied into '
+                             'the resume folder and scored as they arrive, without scanning the resume folder. Repeatable')
+    parser.add_argument('--recover', action='store_true',
+                        help='only finish resumes an interrupted or failed earlier run left unscored, without scanning the resume folder')
+    parser.add_argument('--review-mismatches', action='store_true',
+                        help='review recorded name mismatches for the result folder, then exit')
+    return parser.parse_args(argv)
+
+# Function to apply a config file and command line options on top of the environment
+def apply_cli_options(args):
+    if args.config:
+        if not os.path.exists(args.config):
+            raise SystemExit(f"Config file not found: {args.config}")
+        load_dotenv(args.config, override=True)
+    
+    overrides = {
+        'OPENROUTER_API_KEY': args.api_key,
+        'OPENROUTER_MODEL': args.model,
+        'ADDITIONAL_CRITERIA': args.criteria,
+        'RESUME_FOLDER': args.resume_folder,
+        'JOB_DESC_FOLDER': args.job_desc_folder,
+        'RESULT_FOLDER': args.result_folder,
+        'BATCH_SIZE': args.batch_size,
+        'CONCURRENCY': args.concurrency,
+        'WATCH_INTERVAL': args.watch_interval,
+        'PREFILTER_TOP_K': args.prefilter_top_k,
+        'PREFILTER_MIN_SCORE': args.prefilter_min_score,
+        'METRICS_FILE': args.metrics_file,
+        'STRUCTURED_OUTPUT': 'True' if args.structured_output else None,
+        'DEDUPE': 'False' if args.no_dedupe else None,
+        'CASCADE_MODEL': args.cascade_model,
+        'CASCADE_TOP_PERCENT': args.cascade_top_percent,
+        'CASCADE_MIN_SCORE': args.cascade_min_score,
+        'CASCADE_MAX_SCORE': args.cascade_max_score,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+    load_settings()
+
 # Main function
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+    apply_cli_options(args)
+    interactive = not (args.non_interactive or os.getenv('NON_INTERACTIVE', 'False').lower() in ['true', '1', 't', 'yes'])
+    
+    if args.review_mismatches:
+        for job in load_jobs(args.all_jobs, with_descriptions=False):
+            review_name_mismatches(job['result_folder'])
+        return
+    
     # Ensure API credentials are set
-    if not prompt_for_credentials():
+    if not prompt_for_credentials(interactive):
         print("Exiting program due to missing API credentials.")
         return
     
@@ -343,112 +1058,577 @@ def main():
     for folder in [RESUME_FOLDER, JOB_DESC_FOLDER, RESULT_FOLDER]:
         os.makedirs(folder, exist_ok=True)
         
-    # Check if job description exists
-    job_desc_path = os.path.join(JOB_DESC_FOLDER, 'job_description.md')
-    if not os.path.exists(job_desc_path):
-        print(f"Job description file not found at: {job_desc_path}")
-        print(f"Please create a job description file at this location and try again.")
+    # Load the job description(s); each job gets its own result folder, manifest and ranking
+    jobs = load_jobs(args.all_jobs)
+    if not jobs:
+        return
+    
+    prefilter = PREFILTER_TOP_K is not None or PREFILTER_MIN_SCORE is not None
+    # With the pre-filter on, resumes it left out are only reconsidered when the selection changes
+    done_states = (STATE_SCORED, STATE_FILTERED) if prefilter else (STATE_SCORED,)
+    if prefilter and args.watch:
+        print("ERROR: The pre-filter ranks the whole pool at once, so it can't be combined with --watch.")
+        return
+    if args.recover and args.watch:
+        print("ERROR: --recover finishes an earlier run and exits, so it can't be combined with --watch.")
+        return
+    if args.ingest and (args.watch or args.recover):
+        print("ERROR: --ingest scores the resumes it takes in and exits, so it can't be combined with --watch or --recover.")
+        return
+    if CASCADE_MODEL and args.watch:
+        print("ERROR: The model cascade ranks each job's results at the end of a run, so it can't be combined with --watch.")
         return
         
-    # Get any additional prioritization criteria from the user
-    additional_criteria = get_additional_criteria()
+    # Get any additional prioritization criteria from the user (or the command line / config)
+    additional_criteria = os.getenv('ADDITIONAL_CRITERIA')
+    if additional_criteria is None and not interactive:
+        additional_criteria = ''
+    additional_criteria = get_additional_criteria(additional_criteria)
     
-    # Read job description from .md file
-    job_desc = read_job_description(job_desc_path)
-    if DEBUG: print(f"DEBUG: Loaded job description from {job_desc_path}, length: {len(job_desc)}")
+    # The manifests remember each resume's size, mtime, hash and state from earlier runs
+    for job in jobs:
+        os.makedirs(job['result_folder'], exist_ok=True)
+        job['manifest'] = RunManifest(job['result_folder'])
+        if DEBUG: print(f"DEBUG: Manifest for {job['name']} has {job['manifest'].counts()} files from earlier runs")
+        missing = requeue_missing_results(job['manifest'], job['result_folder'])
+        if missing:
+            print(f"Rescoring {missing} resumes for {job['name']} whose result file was deleted")
+        if DEDUPE:
+            job['duplicates'] = load_duplicate_index(job['manifest'])
+    # Temp files only survive when a write was cut short by a crash
+    for folder in sorted({RESULT_FOLDER} | {job['result_folder'] for job in jobs}):
+        removed = remove_stale_temp_files(folder)
+        if removed:
+            print(f"Removed {removed} partially written files left in {folder} by an interrupted run")
+    unfinished_count = len({resume_file for job in jobs for resume_file in job['manifest'].unfinished()})
+    if unfinished_count:
+        print(f"Resuming {unfinished_count} resumes left unfinished by an earlier run")
+    jobs_by_name = {job['name']: job for job in jobs}
 
-    # Check for existing results to avoid reprocessing
-    existing_json_files = [f for f in os.listdir(RESULT_FOLDER) if f.endswith('.json') and not f.startswith('_')]
-    existing_json_basenames = [os.path.splitext(f)[0] for f in existing_json_files]
+    # Discover -> extract -> score -> persist, with bounded queues between the stages.
+    # Each resume is extracted once and then scored against every job that still needs it.
+    counts = {'processed': 0, 'failed': 0, 'duplicates': 0, 'escalated': 0}
+    counts_lock = threading.Lock()
+    prefilter_scores = {}  # (job name, resume_file) -> normalized BM25 score
     
-    if DEBUG: print(f"DEBUG: Found {len(existing_json_files)} existing JSON result files")
+    # Per resume timings, retries, tokens and cost go to a JSONL trace and a run report
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    recorder = RunRecorder(RESULT_FOLDER, run_id)
+    traces = {}  # (job name, resume_file) -> ResumeTrace while the resume is in the pipeline
+    fingerprints = {}  # resume_file -> (content hash, MinHash signature, jobs yet to dedupe it) for duplicate detection
+    fingerprints_lock = threading.Lock()
+    followers = {}  # (job name, representative) -> duplicates waiting for the representative's score
+    followers_lock = threading.Lock()
 
-    # Load resumes that haven't been processed yet
-    all_resume_files = [f for f in os.listdir(RESUME_FOLDER) if f.endswith('.pdf')]
-    resume_files = []
-    
-    for resume_file in all_resume_files:
-        base_filename = os.path.splitext(resume_file)[0]
-        if base_filename in existing_json_basenames:
-            if DEBUG: print(f"DEBUG: Skipping {resume_file} as it already has a JSON result file")
-            continue
-        resume_files.append(resume_file)
-    
-    if DEBUG: print(f"DEBUG: Found {len(resume_files)} resume files that need processing out of {len(all_resume_files)} total")
-    
-    if not resume_files:
-        print("No new resumes to process. All files have corresponding JSON results.")
-        # Still aggregate and save final results
-        aggregate_and_save_results(RESULT_FOLDER)
-        return
+    def write_run_report():
+        report = recorder.report(index_pipeline.discovered if index_pipeline else pipeline.discovered, run_stats())
+        recorder.save_report(report)
+        if METRICS_FILE:
+            write_metrics_file(METRICS_FILE, report)
+        return report
 
-    # Process each resume individually for maximum reliability
-    processed_count = 0
-    for resume_file in resume_files:
-        print(f"Processing {resume_file} ({processed_count + 1}/{len(resume_files)})")
-        
-        result_text_file = os.path.join(RESULT_FOLDER, f'{resume_file}.txt')
-        if os.path.exists(result_text_file):
-            print(f'Text already extracted. Loading from {result_text_file}')
-            with open(result_text_file, 'r') as f:
-                resume_text = f.read()
-        else:
-            resume_path = os.path.join(RESUME_FOLDER, resume_file)
-            resume_text = extract_text_from_pdf(resume_path)
-            print(f'Extracted text from {resume_file}')
-            with open(result_text_file, 'w') as f:
-                f.write(resume_text)
-        
+    def discover():
+        """Yield (resume_file, content_hash, job_names) for resumes that need scoring, without building the full list.
+
+        Resumes an earlier run left pending, in flight or failed come first, straight from the
+        manifests. In watch mode the folder is rescanned every WATCH_INTERVAL seconds until interrupted.
+        """
+        queued = set()  # (filename, size, mtime_ns) already sent down the pipeline in this run
+        for resume_file, stat, content_hash, job_names in find_unfinished_resumes(jobs, RESUME_FOLDER):
+            queued.add((resume_file, stat.st_size, stat.st_mtime_ns))
+            yield resume_file, content_hash, job_names
+        if args.recover:
+            return
+        if args.ingest:
+            yield from discover_ingested(queued)
+            return
+        aggregated_count = 0
+        while True:
+            with os.scandir(RESUME_FOLDER) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.pdf'):
+                        continue
+                    stat = entry.stat()
+                    if args.watch and time.time() - stat.st_mtime < WATCH_SETTLE_SECONDS:
+                        continue  # Probably still being copied in; pick it up on the next scan
+                    if (entry.name, stat.st_size, stat.st_mtime_ns) in queued:
+                        continue
+                    hash_memo = {}
+                    job_names = []
+                    content_hash = None
+                    for job in jobs:
+                        job_hash = check_resume_changes(job['manifest'], entry, job['result_folder'], hash_memo, done_states)
+                        if job_hash is not None:
+                            content_hash = job_hash
+                            job_names.append(job['name'])
+                    if not job_names:
+                        if DEBUG: print(f"DEBUG: Skipping {entry.name} as it is unchanged and already scored")
+                        continue
+                    if args.watch:
+                        queued.add((entry.name, stat.st_size, stat.st_mtime_ns))
+                    yield entry.name, content_hash, job_names
+            if not args.watch or pipeline.stopped:
+                return
+            # Keep the final rankings current while watching
+            if counts['processed'] != aggregated_count:
+                aggregated_count = counts['processed']
+                for job in jobs:
+                    aggregate_and_save_results(job['result_folder'])
+                write_run_report()
+            time.sleep(WATCH_INTERVAL)
+
+    def discover_ingested(queued):
+        """Copy valid PDFs from the --ingest sources into the resume folder and yield those that need scoring"""
+        ingest_counts = {}
+        for result in ingest(args.ingest, RESUME_FOLDER, EXTRACT_WORKERS, counts=ingest_counts):
+            if result['status'] == 'rejected':
+                print(f"Rejected {result['source']}: {result['reason']}")
+                continue
+            entry = IngestedFile(result['path'], result['stat'])
+            if (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns) in queued:
+                continue
+            # The ingest workers already hashed the file
+            hash_memo = {entry.path: result['sha256']}
+            job_names = []
+            for job in jobs:
+                if check_resume_changes(job['manifest'], entry, job['result_folder'], hash_memo, done_states) is not None:
+                    job_names.append(job['name'])
+            if job_names:
+                yield entry.name, result['sha256'], job_names
+        print(f"Ingested into {RESUME_FOLDER}: {format_counts(ingest_counts)}")
+
+    def extract(item):
+        resume_file, content_hash, job_names = item
+        for job_name in job_names:
+            traces[(job_name, resume_file)] = ResumeTrace(resume_file, job_name)
+        started = time.monotonic()
         try:
-            # Process single resume
-            response = process_resume(resume_file, resume_text, job_desc, additional_criteria)
-            
-            # Parse the result
-            result_data = parse_result(response, resume_file)
-            
-            # Save the result
+            resume_text = extractor.submit(extract_text_cached, os.path.join(RESUME_FOLDER, resume_file),
+                                           TEXT_CACHE_DIR, content_hash).result()
+        except Exception as e:
+            print(f"ERROR: Failed to extract text from {resume_file}: {e}")
+            for job_name in job_names:
+                jobs_by_name[job_name]['manifest'].set_state(resume_file, STATE_FAILED)
+                recorder.finish(traces.pop((job_name, resume_file)), 'failed')
+            with counts_lock:
+                counts['failed'] += len(job_names)
+            return None
+        if DEDUPE:
+            fingerprints[resume_file] = (content_hash, resume_signature(content_hash, resume_text), set(job_names))
+        extracted = time.monotonic()
+        resume_text, compaction = prepare_resume_text(resume_file, resume_text)
+        for job_name in job_names:
+            traces[(job_name, resume_file)].add_time('extract', extracted - started)
+            traces[(job_name, resume_file)].add_time('prompt', time.monotonic() - extracted)
+            traces[(job_name, resume_file)].add_compaction(compaction)
+        if DEBUG: print(f"DEBUG: Extracted text from {resume_file}")
+        # Fan out into one scoring task per job
+        return [(resume_file, resume_text, job_name) for job_name in job_names]
+
+    def resume_signature(content_hash, resume_text):
+        """Signatures are computed once per distinct file and, like extraction, in the process pool"""
+        signature = get_signature_store().get(content_hash)
+        if signature is None:
+            signature = extractor.submit(minhash_signature, resume_text).result()
+            if signature is not None:
+                get_signature_store().set(content_hash, signature)
+        return signature
+
+    def release_fingerprint(resume_file, job_name):
+        """Return a resume's (content hash, signature), forgetting them once every job has used them"""
+        with fingerprints_lock:
+            content_hash, signature, job_names = fingerprints[resume_file]
+            job_names.discard(job_name)
+            if not job_names:
+                del fingerprints[resume_file]
+        return content_hash, signature
+
+    def score(batch):
+        batch = batch if BATCH_SIZE > 1 else [batch]
+        outputs = []
+        # A batch request carries a single job description, so group the batch by job
+        for job in jobs:
+            resumes = [(resume_file, resume_text) for resume_file, resume_text, job_name in batch if job_name == job['name']]
+            if not resumes:
+                continue
+            job_traces = {resume_file: traces[(job['name'], resume_file)] for resume_file, _ in resumes}
+            # Journal the request; a crash from here on leaves these resumes to be rescored on the next run
+            for resume_file, _ in resumes:
+                job['manifest'].set_state(resume_file, STATE_IN_FLIGHT)
+            try:
+                results = score_resume_batch(resumes, job['description'], additional_criteria, job_traces)
+            except FatalAPIError as e:
+                # Retrying won't help (e.g. invalid API key), so stop the whole run
+                if not pipeline.stopped:
+                    print(f"ERROR: Stopping the program after a fatal API error: {e}")
+                pipeline.stop()
+                results = {}
+            except Exception as e:
+                print(f"ERROR: Failed to process {', '.join(resume_file for resume_file, _ in resumes)}: {e}")
+                results = {}
+            outputs.extend((resume_file, resume_text, job, results.get(resume_file)) for resume_file, resume_text in resumes)
+        return outputs
+
+    def persist(item):
+        resume_file, resume_text, job, result_data = item
+        label = resume_file if len(jobs) == 1 else f"{resume_file} for {job['name']}"
+        trace = traces.pop((job['name'], resume_file))
+        recorder.finish(trace, 'scored' if result_data else 'failed')
+        if result_data:
+            result_data['model'] = trace.model or os.environ.get('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
+            result_data['run_id'] = run_id
+            if (job['name'], resume_file) in prefilter_scores:
+                result_data['prefilter_score'] = prefilter_scores[(job['name'], resume_file)]
+            save_resume_text(resume_file, resume_text, job['result_folder'])
+            save_result(result_data, job['result_folder'])
+            job['manifest'].set_state(resume_file, STATE_SCORED)
+            with counts_lock:
+                counts['processed'] += 1
+            print(f"Scored {label}: {result_data['name']} - {result_data['score']}")
+        else:
+            job['manifest'].set_state(resume_file, STATE_FAILED)
+            with counts_lock:
+                counts['failed'] += 1
+            print(f"Failed to process {label} - invalid response format")
+
+        # Duplicates that arrived while this resume was being scored share its outcome
+        with followers_lock:
+            waiting = followers.pop((job['name'], resume_file), [])
+        for duplicate_file, duplicate_text, similarity, match in waiting:
             if result_data:
-                save_result(result_data, RESULT_FOLDER)
-                processed_count += 1
-                print(f"Scored {resume_file}: {result_data['name']} - {result_data['score']}")
+                persist_duplicate(duplicate_file, duplicate_text, job, result_data, similarity, match)
             else:
-                print(f"Failed to process {resume_file} - invalid response format")
-            
-            # Small delay to avoid rate limiting
-            time.sleep(1)
-            
+                # Left for the next run, which picks a new representative
+                job['manifest'].set_state(duplicate_file, STATE_FAILED)
+                recorder.finish(traces.pop((job['name'], duplicate_file)), 'failed')
+                with counts_lock:
+                    counts['failed'] += 1
+
+    def persist_duplicate(resume_file, resume_text, job, representative_result, similarity, match):
+        label = resume_file if len(jobs) == 1 else f"{resume_file} for {job['name']}"
+        result_data = build_duplicate_result(representative_result, resume_file, similarity, match)
+        result_data['run_id'] = run_id
+        save_resume_text(resume_file, resume_text, job['result_folder'])
+        save_result(result_data, job['result_folder'])
+        job['manifest'].set_state(resume_file, STATE_SCORED)
+        recorder.finish(traces.pop((job['name'], resume_file)), 'duplicate')
+        with counts_lock:
+            counts['duplicates'] += 1
+        print(f"Duplicate {label}: same resume as {result_data['duplicate_of']} - {result_data['score']}")
+
+    def dedupe(item):
+        """Pass on resumes that need scoring; duplicates of a representative get its score instead"""
+        resume_file, resume_text, job_name = item
+        job = jobs_by_name[job_name]
+        content_hash, signature = release_fingerprint(resume_file, job_name)
+        # A resume edited since it was scored must not match its own old text
+        job['duplicates'].remove(resume_file)
+        match = job['duplicates'].match(content_hash, signature)
+        if match is not None:
+            representative, similarity, kind = match
+            with followers_lock:
+                if (job_name, representative) in followers:
+                    # Still being scored in this run; persist hands the score on
+                    followers[(job_name, representative)].append((resume_file, resume_text, similarity, kind))
+                    return None
+            representative_result = read_result(
+                os.path.join(job['result_folder'], f'{os.path.splitext(representative)[0]}.json'))
+            # A copy of this resume (e.g. its result file was deleted) can't stand in for it
+            if representative_result is not None and representative_result.get('duplicate_of') != resume_file:
+                persist_duplicate(resume_file, resume_text, job, representative_result, similarity, kind)
+                return None
+        job['duplicates'].add(resume_file, content_hash, signature)
+        with followers_lock:
+            followers[(job_name, resume_file)] = []
+        return [item]
+
+    # Pre-filter mode: extract and index everything first, then score only the best keyword matches
+    index_pipeline = None
+    bm25 = BM25Index()
+    pending = {}  # resume_file -> (content_hash, job names) for everything extracted in the first phase
+
+    def index_resume(item):
+        resume_file, resume_text, job_name = item
+        bm25.add(resume_file, resume_text)
+        return None
+
+    def extract_for_index(item):
+        resume_file, content_hash, job_names = item
+        pending[resume_file] = (content_hash, job_names)
+        return extract(item)
+
+    def index_pool(files):
+        """Add resumes scored or filtered out in earlier runs ({resume_file: content hash}) to the BM25 index"""
+        futures = {
+            resume_file: extractor.submit(extract_text_cached, os.path.join(RESUME_FOLDER, resume_file), TEXT_CACHE_DIR, content_hash)
+            for resume_file, content_hash in files.items() if resume_file not in bm25.doc_terms
+        }
+        for resume_file, future in futures.items():
+            try:
+                bm25.add(resume_file, prepare_resume_text(resume_file, future.result())[0])
+            except Exception as e:
+                print(f"ERROR: Failed to extract text from {resume_file}: {e}")
+
+    def selected_resumes():
+        """Rank each job's resume pool with BM25 and yield the (resume_file, resume_text, job_name) still to score.
+
+        The pool is every resume of the job: new and changed ones plus those scored or filtered
+        out before. The selection is only recomputed when the pool, the job description or the
+        criteria changed, and resumes already scored stay scored whether or not they still make it.
+        """
+        for job in jobs:
+            manifest = job['manifest']
+            new = {resume_file: content_hash for resume_file, (content_hash, job_names) in pending.items()
+                   if job['name'] in job_names and resume_file in bm25.doc_terms}
+            known = {resume_file: row[2] for resume_file, row in {**manifest.scored(), **manifest.filtered()}.items()
+                     if resume_file not in new and os.path.exists(os.path.join(RESUME_FOLDER, resume_file))}
+            fingerprint = selection_fingerprint(job['description'], additional_criteria, PREFILTER_TOP_K, PREFILTER_MIN_SCORE)
+            previous = load_selection(job['result_folder'])
+            if not new and previous and previous['fingerprint'] == fingerprint and previous['scores'].keys() == known.keys():
+                if DEBUG: print(f"DEBUG: Pre-filter selection for {job['name']} is unchanged")
+                continue
+
+            index_pool(known)
+            candidates = [resume_file for resume_file in [*new, *known] if resume_file in bm25.doc_terms]
+            normalized, selected = select_top(bm25.score(job['description'], candidates), PREFILTER_TOP_K, PREFILTER_MIN_SCORE)
+            save_selection(job['result_folder'], fingerprint, {resume_file: normalized[resume_file] for resume_file in candidates})
+            to_score = [resume_file for resume_file in selected if resume_file in new or manifest.get(resume_file)[3] == STATE_FILTERED]
+            print(f"Pre-filter selected {len(selected)} of {len(candidates)} resumes for {job['name']} "
+                  f"({len(to_score)} not scored yet)")
+            for resume_file in candidates:
+                prefilter_scores[(job['name'], resume_file)] = normalized[resume_file]
+            for resume_file in new:
+                if resume_file not in selected:
+                    manifest.set_state(resume_file, STATE_FILTERED)
+                    recorder.finish(traces.pop((job['name'], resume_file)), 'filtered')
+                    if DEDUPE and resume_file in fingerprints:
+                        release_fingerprint(resume_file, job['name'])
+            for resume_file in sorted(to_score, key=normalized.get, reverse=True):
+                content_hash = new.get(resume_file) or known[resume_file]
+                resume_text = extract_text_cached(os.path.join(RESUME_FOLDER, resume_file), TEXT_CACHE_DIR, content_hash)
+                if resume_file not in new:
+                    # Filtered out before and now in the selection, so it skipped the extract stage
+                    manifest.set_state(resume_file, STATE_PENDING)
+                    traces[(job['name'], resume_file)] = ResumeTrace(resume_file, job['name'])
+                    if DEDUPE:
+                        signature = resume_signature(content_hash, resume_text)
+                        with fingerprints_lock:
+                            fingerprints.setdefault(resume_file, (content_hash, signature, set()))[2].add(job['name'])
+                resume_text, _ = prepare_resume_text(resume_file, resume_text)
+                yield resume_file, resume_text, job['name']
+
+    # Model cascade: once the first pass is done, the stronger model rescores each job's borderline candidates
+    cascade_pipeline = None
+
+    def cascade_candidates():
+        for job in jobs:
+            results = get_ranking_index(job['result_folder']).ranked()
+            selected = select_for_escalation(results, CASCADE_MODEL,
+                                             CASCADE_TOP_PERCENT, CASCADE_MIN_SCORE, CASCADE_MAX_SCORE)
+            if selected:
+                print(f"Rescoring {len(selected)} candidates for {job['name']} with {CASCADE_MODEL}")
+            # Copies of a resume carry its score, so they move with it
+            selected_files = {result_data['original_filename'] for result_data in selected}
+            duplicates = {}
+            for result_data in results:
+                if result_data.get('duplicate_of') in selected_files:
+                    duplicates.setdefault(result_data['duplicate_of'], []).append(result_data)
+            del results
+            for result_data in selected:
+                yield job['name'], result_data, duplicates.get(result_data['original_filename'], [])
+
+    def escalate(item):
+        job_name, result_data, duplicates = item
+        job = jobs_by_name[job_name]
+        resume_file = result_data['original_filename']
+        trace = ResumeTrace(resume_file, job_name)
+        escalated = None
+        try:
+            with open(os.path.join(job['result_folder'], f'{resume_file}.txt'), 'r', encoding='utf-8') as f:
+                resume_text = f.read()
+            escalated = score_resume_file(resume_file, resume_text, job['description'], additional_criteria, trace, CASCADE_MODEL)
+        except FatalAPIError as e:
+            if not cascade_pipeline.stopped:
+                print(f"ERROR: Stopping the cascade after a fatal API error: {e}")
+            cascade_pipeline.stop()
         except Exception as e:
-            print(f"ERROR: Failed to process {resume_file}: {e}")
-            # Continue with next resume instead of stopping completely
-            continue
+            print(f"ERROR: Failed to rescore {resume_file} with {CASCADE_MODEL}: {e}")
+        return [(job, result_data, duplicates, escalated, trace)]
+
+    def persist_escalation(item):
+        job, result_data, duplicates, escalated, trace = item
+        resume_file = result_data['original_filename']
+        label = resume_file if len(jobs) == 1 else f"{resume_file} for {job['name']}"
+        recorder.finish(trace, 'escalated' if escalated else 'failed')
+        if not escalated:
+            with counts_lock:
+                counts['failed'] += 1
+            print(f"Failed to rescore {label} with {CASCADE_MODEL} - keeping the first-pass score")
+            return None
+        merged = merge_cascade_result(result_data, escalated, CASCADE_MODEL)
+        merged['run_id'] = run_id
+        save_result(merged, job['result_folder'])
+        for duplicate in duplicates:
+            save_result({**duplicate, **{key: merged[key] for key in ('score', 'reason', 'model', 'tiers')}},
+                        job['result_folder'])
+        with counts_lock:
+            counts['escalated'] += 1
+        print(f"Rescored {label} with {CASCADE_MODEL}: {first_tier_score(result_data)} -> {merged['score']}")
+        return None
+
+    def run_stats():
+        return ((index_pipeline.stats() if index_pipeline else []) + pipeline.stats()
+                + (cascade_pipeline.stats() if cascade_pipeline else []))
+
+    def dedupe_stages():
+        return [Stage('dedupe', dedupe, workers=1, queue_size=QUEUE_SIZE)] if DEDUPE else []
+
+    def score_stage():
+        return Stage('score', score, workers=CONCURRENCY, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE)
+
+    def persist_stage():
+        return Stage('persist', persist, workers=PERSIST_WORKERS, queue_size=QUEUE_SIZE)
+
+    # Text extraction is CPU-bound, so the extract stage's threads hand the work to a process pool
+    with ProcessPoolExecutor(max_workers=EXTRACT_WORKERS) as extractor:
+        if prefilter:
+            index_pipeline = Pipeline(discover(), [
+                Stage('extract', extract_for_index, workers=EXTRACT_WORKERS, queue_size=QUEUE_SIZE),
+                Stage('index', index_resume, workers=1, queue_size=QUEUE_SIZE),
+            ])
+            index_pipeline.run(stats_interval=PIPELINE_STATS_INTERVAL)
+            pipeline = Pipeline(selected_resumes(), dedupe_stages() + [score_stage(), persist_stage()], source_name='prefilter')
+        else:
+            pipeline = Pipeline(discover(), [
+                Stage('extract', extract, workers=EXTRACT_WORKERS, queue_size=QUEUE_SIZE),
+                *dedupe_stages(),
+                score_stage(),
+                persist_stage(),
+            ])
+        if args.watch:
+            print(f"Watching {RESUME_FOLDER} for new resumes every {WATCH_INTERVAL:g} seconds. Press Ctrl+C to stop.")
+        interrupted = False
+        try:
+            pipeline.run(stats_interval=PIPELINE_STATS_INTERVAL)
+        except KeyboardInterrupt:
+            print("\nStopped. Finishing resumes already in progress...")
+            interrupted = True
+
+    if CASCADE_MODEL and not interrupted and not pipeline.stopped:
+        cascade_pipeline = Pipeline(cascade_candidates(), [
+            Stage('escalate', escalate, workers=CONCURRENCY, queue_size=QUEUE_SIZE),
+            Stage('persist', persist_escalation, workers=PERSIST_WORKERS, queue_size=QUEUE_SIZE),
+        ], source_name='cascade')
+        try:
+            cascade_pipeline.run(stats_interval=PIPELINE_STATS_INTERVAL)
+        except KeyboardInterrupt:
+            print("\nStopped. Finishing rescores already in progress...")
 
-    print(f"Processed {processed_count} out of {len(resume_files)} resumes")
+    if not pipeline.discovered:
+        print("No new or changed resumes to process. All files have been scored.")
+    elif len(jobs) == 1:
+        print(f"Processed {counts['processed']} out of {pipeline.discovered} resumes")
+        print(pipeline.format_stats())
+    else:
+        print(f"Processed {counts['processed']} out of {counts['processed'] + counts['failed'] + counts['duplicates']} "
+              f"resume/job pairs for {pipeline.discovered} resumes")
+        print(pipeline.format_stats())
+    if counts['duplicates']:
+        print(f"Gave {counts['duplicates']} duplicate resumes the score of the copy that was scored (see {DUPLICATE_REPORT_FILENAME})")
+    if cascade_pipeline and cascade_pipeline.discovered:
+        print(f"Rescored {counts['escalated']} out of {cascade_pipeline.discovered} borderline candidates with {CASCADE_MODEL}")
+        print(cascade_pipeline.format_stats())
+    
+    # A run with nothing to do keeps the previous run's report
+    report = None
+    recorder.close()
+    if pipeline.discovered or (cascade_pipeline and cascade_pipeline.discovered):
+        report = write_run_report()
+        cost = f" (about ${report['cost_usd']:.4f})" if report['cost_usd'] is not None else ''
+        print(f"Used {report['prompt_tokens']} prompt ({report['cached_tokens']} served from the provider's prompt cache) "
+              f"and {report['completion_tokens']} completion tokens{cost}")
+        if report['text_tokens_before']:
+            saved = report['text_tokens_before'] - report['text_tokens_after']
+            print(f"Compaction cut resume text from {report['text_tokens_before']} to {report['text_tokens_after']} tokens "
+                  f"({saved / report['text_tokens_before']:.0%} saved, {report['truncated']} truncated)")
+        if DEBUG: print(f"DEBUG: Run report saved to {os.path.join(RESULT_FOLDER, '_run_report.json')}")
     
     # Aggregate and save final results
-    aggregate_and_save_results(RESULT_FOLDER)
+    for job in jobs:
+        if len(jobs) > 1: print(f"\n=== {job['name']} ===")
+        aggregate_and_save_results(job['result_folder'])
+    if len(jobs) > 1:
+        save_score_matrix(jobs, RESULT_FOLDER)
+    
+    # Name mismatches are settled once scoring is done, so they never stall the run
+    for job in jobs:
+        if interactive:
+            review_name_mismatches(job['result_folder'])
+        else:
+            mismatch_count = sum(1 for result in get_ranking_index(job['result_folder']).ranked() if result.get('name_mismatch'))
+            if mismatch_count:
+                print(f"{mismatch_count} name mismatches in {job['result_folder']} need review. "
+                      f"Run with --review-mismatches to settle them.")
+    
+    # Summary for callers such as the benchmark harness
+    return {
+        'discovered': index_pipeline.discovered if index_pipeline else pipeline.discovered,
+        'processed': counts['processed'],
+        'failed': counts['failed'],
+        'duplicates': counts['duplicates'],
+        'escalated': counts['escalated'],
+        'stages': run_stats(),
+        'report': report,
+    }
 
 def aggregate_and_save_results(result_folder):
     """Aggregate all results and save the final sorted list"""
-    all_results = []
-    for result_file in os.listdir(result_folder):
-        if result_file.endswith('.json') and not result_file.startswith('_'):
-            with open(os.path.join(result_folder, result_file), 'r') as f:
-                try:
-                    result = json.load(f)
-                    if isinstance(result, dict) and 'score' in result:
-                        all_results.append(result)
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not decode JSON in {result_file}")
-
-    # Sort results by score
-    all_results.sort(key=lambda x: x['score'], reverse=True)
-    print(f'Processed {len(all_results)} resumes in total')
+    index = get_ranking_index(result_folder)
+    final_result_file = os.path.join(result_folder, '_final_results.json')
+    print(f'Processed {index.count()} resumes in total')
+
+    # Nothing changed since the last export, so the existing files are already correct
+    export_files = [final_result_file] + list(export_paths(result_folder).values())
+    if index.is_exported() and all(os.path.exists(path) for path in export_files):
+        print(f'Final sorted results in {result_folder} are up to date')
+        return
+
+    # The index returns results already sorted by score
+    all_results = index.ranked()
     
     # Save final sorted results
     print(f'Saving final sorted results to {result_folder}')
-    final_result_file = os.path.join(result_folder, '_final_results.json')
-    with open(final_result_file, 'w') as f:
+    with atomic_write(final_result_file) as f:
         json.dump(all_results, f, indent=4)
+    # Compact line and columnar copies for streaming consumers, pandas and DuckDB
+    write_exports(all_results, result_folder)
+    write_duplicate_report(all_results, result_folder)
+    index.mark_exported()
+
+def save_score_matrix(jobs, result_folder):
+    """Save a candidate-by-job score matrix (JSON and CSV) built from each job's ranking index"""
+    job_names = [job['name'] for job in jobs]
+    candidates = {}
+    for job in jobs:
+        for result in get_ranking_index(job['result_folder']).ranked():
+            candidate = candidates.setdefault(result['original_filename'], {
+                'original_filename': result['original_filename'],
+                'name': result['name'],
+                'scores': {}
+            })
+            candidate['scores'][job['name']] = result['score']
+
+    # Order candidates by their best score across all jobs
+    rows = sorted(candidates.values(), key=lambda c: max(c['scores'].values()), reverse=True)
+
+    with atomic_write(os.path.join(result_folder, '_score_matrix.json')) as f:
+        json.dump({'jobs': job_names, 'candidates': rows}, f, indent=4)
+    with atomic_write(os.path.join(result_folder, '_score_matrix.csv'), newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['original_filename', 'name'] + job_names)
+        for row in rows:
+            writer.writerow([row['original_filename'], row['name']] + [row['scores'].get(name, '') for name in job_names])
+    print(f'Saved candidate-by-job score matrix for {len(rows)} candidates to {result_folder}')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,468 @@
+import os
+import json
+import time
+import uuid
+import queue
+import hashlib
+import argparse
+import posixpath
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from dotenv import load_dotenv
+
+import resume_scorer as scorer
+from pipeline import Pipeline, Stage
+from ranking_index import get_ranking_index
+from manifest import RunManifest, STATE_PENDING, STATE_IN_FLIGHT, STATE_SCORED, STATE_FAILED
+from instrumentation import ResumeTrace
+from ingest import MAX_PDF_BYTES, validate_pdf, publish
+from pdf_extraction import extract_text_cached
+
+# Long-lived scoring service for applicant tracking systems that submit resumes one at a
+# time. The job descriptions, HTTP session, caches and extraction process pool stay warm
+# between requests. Uploads are copied into the resume folder and scored by the same
+# extract -> score -> persist pipeline as a batch run, so their results, manifests and
+# rankings are shared with resume_scorer.py. Identical uploads in flight are scored once,
+# and a copy sent under another name gets that score as a duplicate, like in a batch run.
+# A full queue answers 503 with Retry-After instead of piling up work.
+
+TASK_QUEUED = 'queued'
+TASK_SCORING = 'scoring'
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+
+RETRY_AFTER_SECONDS = 5  # Suggested wait for clients turned away by a full queue
+MAX_WAIT_SECONDS = 120  # Longest a request may block with ?wait= before getting 202
+RETAINED_TASKS = 10000  # Finished tasks kept for status lookups, oldest dropped first
+
+
+class ScoringTask:
+    """One uploaded resume scored against one job, shared by every request that asked for it"""
+
+    def __init__(self, job, filename, content_hash, data):
+        self.id = uuid.uuid4().hex
+        self.job = job
+        self.filename = filename
+        self.content_hash = content_hash
+        self.data = data  # Dropped once the file is in the resume folder
+        self.resume_file = None
+        self.copies = []  # Tasks for the same PDF under other names, finished with this task's score
+        self.status = TASK_QUEUED
+        self.result = None
+        self.error = None
+        self.trace = ResumeTrace(filename, job['name'])
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def finish(self, result=None, error=None):
+        self.status = TASK_DONE if result else TASK_FAILED
+        self.result = result
+        self.error = error if not result else None
+        self.finished_at = time.time()
+        self.data = None
+        self.done.set()
+
+    def to_dict(self):
+        task = {
+            'id': self.id,
+            'status': self.status,
+            'job': self.job['name'],
+            'filename': self.filename,
+            'resume_file': self.resume_file,
+            'sha256': self.content_hash,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+        if self.result:
+            task['result'] = self.result
+        if self.error:
+            task['error'] = self.error
+        if self.done.is_set() and self.trace.model:
+            trace = self.trace.to_dict()
+            task['usage'] = {key: trace[key] for key in ('prompt_tokens', 'completion_tokens', 'cached_tokens', 'cost_usd')}
+        return task
+
+
+class ScoringService:
+    """Queues uploaded resumes and scores them in a background pipeline"""
+
+    def __init__(self, jobs, additional_criteria=''):
+        self.jobs = {job['name']: job for job in jobs}
+        self.default_job = jobs[0]['name'] if len(jobs) == 1 else None
+        self.additional_criteria = additional_criteria
+        self.run_id = f"service-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        # The bounded admission queue is the backpressure point: submit() fails fast when it is full
+        self.pending = queue.Queue(maxsize=scorer.QUEUE_SIZE)
+        self.tasks = OrderedDict()  # id -> ScoringTask
+        self.in_flight = {}  # (job name, content hash) -> task being scored
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self.pipeline = None
+        self._thread = None
+        self._extractor = None
+
+    def start(self):
+        self._extractor = ProcessPoolExecutor(max_workers=scorer.EXTRACT_WORKERS)
+        self.pipeline = Pipeline(iter(self.pending.get, None), [
+            Stage('extract', self._guard(self.extract), workers=scorer.EXTRACT_WORKERS, queue_size=scorer.QUEUE_SIZE),
+            Stage('score', self._guard(self.score), workers=scorer.CONCURRENCY, queue_size=scorer.QUEUE_SIZE),
+            Stage('persist', self._guard(self.persist), workers=scorer.PERSIST_WORKERS, queue_size=scorer.QUEUE_SIZE),
+        ], source_name='upload')
+        self._thread = threading.Thread(target=self.pipeline.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Finish the queued tasks, then refresh each job's final results"""
+        self.pending.put(None)
+        self._thread.join()
+        self._extractor.shutdown()
+        for job in self.jobs.values():
+            scorer.aggregate_and_save_results(job['result_folder'])
+
+    def job(self, job_name=None):
+        """Return the named job (the only one when job_name is None), or raise KeyError"""
+        job_name = job_name or self.default_job
+        if job_name not in self.jobs:
+            raise KeyError(job_name)
+        return self.jobs[job_name]
+
+    def get(self, task_id):
+        with self._lock:
+            return self.tasks.get(task_id)
+
+    def submit(self, job, filename, data):
+        """Return (task, coalesced) for an upload, or raise queue.Full when the service is saturated.
+
+        An upload identical to one still being scored gets that task, or under another name
+        its own task that gets the same score as a duplicate. One whose file and score are
+        already saved gets a finished task without another API call.
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        key = (job['name'], content_hash)
+        with self._lock:
+            if key in self.in_flight:
+                scoring = self.in_flight[key]
+                if scoring.filename == filename:
+                    return scoring, True
+                task = ScoringTask(job, filename, content_hash, data)
+                scoring.copies.append(task)
+                self.tasks[task.id] = task
+                self._forget_old_tasks()
+                return task, True
+            task = ScoringTask(job, filename, content_hash, data)
+            existing = self._saved_result(job, filename, content_hash)
+            if existing is not None:
+                task.resume_file = existing['original_filename']
+                task.finish(existing)
+            else:
+                self.pending.put_nowait(task)
+                self.in_flight[key] = task
+            self.tasks[task.id] = task
+            self._forget_old_tasks()
+        return task, False
+
+    def _saved_result(self, job, filename, content_hash):
+        """The saved result of an identical resume under the same name, if it is scored"""
+        stem = os.path.splitext(filename)[0]
+        entry = job['manifest'].get(f'{stem}.pdf')
+        if entry and entry[2] == content_hash and entry[3] == STATE_SCORED:
+            return scorer.read_result(os.path.join(job['result_folder'], f'{stem}.json'))
+        return None
+
+    def _forget_old_tasks(self):
+        while len(self.tasks) > RETAINED_TASKS:
+            oldest = next(iter(self.tasks.values()))
+            if not oldest.done.is_set():
+                break
+            self.tasks.popitem(last=False)
+
+    def _guard(self, func):
+        """Fail the task instead of leaving it pending when a stage raises"""
+        def run(item):
+            task = item[0] if isinstance(item, tuple) else item
+            try:
+                return func(item)
+            except Exception as e:
+                print(f"ERROR: Failed to score {task.filename} for {task.job['name']}: {e}")
+                self._finish(task, error=str(e))
+                return None
+        return run
+
+    def _finish(self, task, result=None, error=None, resume_text=None):
+        if task.resume_file:
+            task.job['manifest'].set_state(task.resume_file, STATE_SCORED if result else STATE_FAILED)
+        with self._lock:
+            self.in_flight.pop((task.job['name'], task.content_hash), None)
+            copies = task.copies
+        task.finish(result, error)
+        for copy in copies:
+            try:
+                self._finish_copy(copy, result, error, resume_text)
+            except Exception as e:
+                print(f"ERROR: Failed to save {copy.filename} for {copy.job['name']}: {e}")
+                copy.finish(error=str(e))
+
+    def _finish_copy(self, task, result, error, resume_text):
+        """Give an upload of the same PDF under another name the score of the one that was scored"""
+        if not result:
+            task.finish(error=error)
+            return
+        path = self._publish(task)
+        result_data = scorer.build_duplicate_result(result, task.resume_file, 1.0, 'exact')
+        result_data['run_id'] = self.run_id
+        if resume_text is not None:
+            scorer.save_resume_text(task.resume_file, resume_text, task.job['result_folder'])
+        scorer.save_result(result_data, task.job['result_folder'])
+        task.job['manifest'].set_state(task.resume_file, STATE_SCORED)
+        task.finish(result_data)
+        print(f"Duplicate {task.resume_file} for {task.job['name']}: same resume as {result_data['duplicate_of']} - {result_data['score']}")
+
+    def _publish(self, task):
+        """Copy an upload into the resume folder and journal it as pending, like a batch run"""
+        # The lock keeps two uploads of different files from racing for the same free name
+        with self._publish_lock:
+            path, _ = publish(task.data, task.content_hash, scorer.RESUME_FOLDER, task.filename)
+        task.resume_file = os.path.basename(path)
+        stat = os.stat(path)
+        # Journaled like a batch run, so resume_scorer.py --recover finishes it after a crash
+        task.job['manifest'].record(task.resume_file, stat.st_size, stat.st_mtime_ns, task.content_hash, STATE_PENDING)
+        return path
+
+    def extract(self, task):
+        path = self._publish(task)
+        started = time.monotonic()
+        resume_text = self._extractor.submit(extract_text_cached, path, scorer.TEXT_CACHE_DIR, task.content_hash).result()
+        extracted = time.monotonic()
+        resume_text, compaction = scorer.prepare_resume_text(task.resume_file, resume_text)
+        task.trace.add_time('extract', extracted - started)
+        task.trace.add_time('prompt', time.monotonic() - extracted)
+        task.trace.add_compaction(compaction)
+        return [(task, resume_text)]
+
+    def score(self, item):
+        task, resume_text = item
+        task.status = TASK_SCORING
+        task.job['manifest'].set_state(task.resume_file, STATE_IN_FLIGHT)
+        result_data = scorer.score_resume_file(task.resume_file, resume_text, task.job['description'],
+                                               self.additional_criteria, task.trace)
+        return [(task, resume_text, result_data)]
+
+    def persist(self, item):
+        task, resume_text, result_data = item
+        if not result_data:
+            self._finish(task, error='invalid response format')
+            return None
+        result_data['model'] = task.trace.model or os.environ.get('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
+        result_data['run_id'] = self.run_id
+        scorer.save_resume_text(task.resume_file, resume_text, task.job['result_folder'])
+        scorer.save_result(result_data, task.job['result_folder'])
+        self._finish(task, result_data, resume_text=resume_text)
+        print(f"Scored {task.resume_file} for {task.job['name']}: {result_data['name']} - {result_data['score']}")
+        return None
+
+    def health(self):
+        with self._lock:
+            in_flight = len(self.in_flight)
+        return {
+            'status': 'ok',
+            'jobs': sorted(self.jobs),
+            'queued': self.pending.qsize(),
+            'queue_size': self.pending.maxsize,
+            'in_flight': in_flight,
+            'pipeline': self.pipeline.stats() if self.pipeline else [],
+        }
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API of the scoring service.
+
+    POST /score?filename=NAME.pdf[&job=NAME][&wait=SECONDS]  body: the PDF
+    GET  /tasks/ID
+    GET  /ranking[?job=NAME][&limit=N]
+    GET  /health
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if scorer.DEBUG:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status, message, headers=None):
+        self.send_json(status, {'error': {'message': message}}, headers)
+
+    def query(self):
+        return {key: values[-1] for key, values in parse_qs(urlsplit(self.path).query).items()}
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlsplit(self.path).path.rstrip('/')
+        params = self.query()
+        if path == '/health':
+            self.send_json(200, service.health())
+        elif path.startswith('/tasks/'):
+            task = service.get(path[len('/tasks/'):])
+            if task is None:
+                self.send_error_json(404, 'Unknown task')
+            else:
+                self.send_json(200, task.to_dict())
+        elif path == '/ranking':
+            try:
+                job = service.job(params.get('job'))
+                limit = int(params.get('limit', 10))
+            except KeyError:
+                self.send_error_json(404, f"Unknown job; choose one of {', '.join(sorted(service.jobs))}")
+                return
+            except ValueError:
+                self.send_error_json(400, 'limit must be a number')
+                return
+            self.send_json(200, {'job': job['name'], 'results': get_ranking_index(job['result_folder']).top(limit)})
+        else:
+            self.send_error_json(404, f'Unknown path {path}')
+
+    def do_POST(self):
+        service = self.server.service
+        path = urlsplit(self.path).path.rstrip('/')
+        params = self.query()
+        length = self.headers.get('Content-Length')
+        if path != '/score':
+            self.send_error_json(404, f'Unknown path {path}')
+            return
+        if length is None:
+            self.send_error_json(411, 'Content-Length is required')
+            return
+        try:
+            length = int(length)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # The body's end is unknown, so the connection can't be reused
+            self.close_connection = True
+            self.send_error_json(400, 'Content-Length must be a non-negative integer')
+            return
+        if length > MAX_PDF_BYTES:
+            # The body is never read, so the connection can't be reused
+            self.close_connection = True
+            self.send_error_json(413, f'Resumes are limited to {MAX_PDF_BYTES // (1024 * 1024)} MB')
+            return
+        data = self.rfile.read(length)
+
+        filename = posixpath.basename((params.get('filename') or '').replace('\\', '/')).strip()
+        if not filename:
+            self.send_error_json(400, 'filename is required, e.g. /score?filename=Jane_Doe_CV.pdf')
+            return
+        try:
+            job = service.job(params.get('job'))
+            wait = min(float(params.get('wait', 0)), MAX_WAIT_SECONDS)
+        except KeyError:
+            self.send_error_json(404, f"Unknown job; choose one of {', '.join(sorted(service.jobs))}")
+            return
+        except ValueError:
+            self.send_error_json(400, 'wait must be a number of seconds')
+            return
+        reason = validate_pdf(data)
+        if reason:
+            self.send_error_json(422, f'Not a usable resume: {reason}')
+            return
+        try:
+            task, coalesced = service.submit(job, filename, data)
+        except queue.Full:
+            self.send_error_json(503, 'Scoring queue is full, try again later',
+                                 {'Retry-After': str(RETRY_AFTER_SECONDS)})
+            return
+
+        if wait > 0:
+            task.done.wait(wait)
+        body = {**task.to_dict(), 'coalesced': coalesced}
+        if task.done.is_set():
+            self.send_json(200, body)
+        else:
+            self.send_json(202, body, {'Location': f'/tasks/{task.id}'})
+
+
+class ScoringHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Listen backlog, read when the socket is opened; the scoring queue, not the socket, decides who gets a 503
+    request_queue_size = 256
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run a local HTTP service that scores uploaded resume PDFs, keeping the job descriptions, '
+                    'HTTP client and caches warm between requests.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default 8000)')
+    parser.add_argument('--config', help='settings file in .env format, applied on top of .env')
+    parser.add_argument('--api-key', help='OpenRouter API key (not saved to .env)')
+    parser.add_argument('--model', help='OpenRouter model name (not saved to .env)')
+    parser.add_argument('--criteria', help='additional prioritization criteria')
+    parser.add_argument('--concurrency', type=int, help='API requests in flight at once')
+    parser.add_argument('--queue-size', type=int, help='uploads waiting to be scored before new ones get 503')
+    parser.add_argument('--all-jobs', action='store_true',
+                        help='serve every .md job description in the job description folder (pick one with ?job=NAME)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.config:
+        if not os.path.exists(args.config):
+            raise SystemExit(f"Config file not found: {args.config}")
+        load_dotenv(args.config, override=True)
+    overrides = {
+        'OPENROUTER_API_KEY': args.api_key,
+        'OPENROUTER_MODEL': args.model,
+        'ADDITIONAL_CRITERIA': args.criteria,
+        'CONCURRENCY': args.concurrency,
+        'QUEUE_SIZE': args.queue_size,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+    scorer.load_settings()
+
+    # A service never prompts
+    if not scorer.prompt_for_credentials(interactive=False):
+        return
+    for folder in [scorer.RESUME_FOLDER, scorer.JOB_DESC_FOLDER, scorer.RESULT_FOLDER]:
+        os.makedirs(folder, exist_ok=True)
+    jobs = scorer.load_jobs(args.all_jobs)
+    if not jobs:
+        return
+    for job in jobs:
+        os.makedirs(job['result_folder'], exist_ok=True)
+        job['manifest'] = RunManifest(job['result_folder'])
+
+    # Filtered like a batch run's criteria, so they can't override the reply format
+    additional_criteria = scorer.get_additional_criteria(os.getenv('ADDITIONAL_CRITERIA') or '')
+    service = ScoringService(jobs, additional_criteria)
+    service.start()
+    server = ScoringHTTPServer((args.host, args.port), ScoringRequestHandler)
+    server.service = service
+    print(f"Scoring resumes for {', '.join(sorted(service.jobs))} on http://{args.host}:{server.server_address[1]}. "
+          f"Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped. Finishing resumes already queued...")
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
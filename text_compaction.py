@@ -0,0 +1,149 @@
+import re
+import threading
+from collections import Counter
+
+try:
+    import tiktoken
+except ImportError:  # Optional; token counts fall back to an estimate
+    tiktoken = None
+
+# Shrinks extracted resume text before it is sent to the model: normalizes whitespace,
+# drops page numbers and headers/footers repeated on every page, removes duplicate
+# lines and truncates to a token budget.
+
+PAGE_BREAK = '\f'  # extract_text_from_pdf separates pages with a form feed
+CHARS_PER_TOKEN = 4  # Rough average for English text when tiktoken isn't installed
+TIKTOKEN_ENCODING = 'o200k_base'
+EDGE_LINES = 3  # Lines at the top and bottom of each page checked for headers and footers
+DEDUPE_MIN_CHARS = 30  # Shorter lines are only dropped when they repeat back to back
+TRUNCATION_MARKER = '[... truncated]'
+
+PAGE_NUMBER_PATTERN = re.compile(r'^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$', re.IGNORECASE)
+SPACE_PATTERN = re.compile(r'[ \t\u00a0\u2000-\u200b\u3000]+')
+CONTROL_PATTERN = re.compile(r'[\x00-\x08\x0b\x0e-\x1f\x7f\ufffd]')
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """Return the tiktoken encoding, or None if tiktoken (or its encoding data) isn't available"""
+    global _encoding
+    if tiktoken is None:
+        return None
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+            except Exception:
+                _encoding = False  # e.g. offline and the encoding isn't cached; don't try again
+        return _encoding or None
+
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize_whitespace(text):
+    """Collapse runs of spaces, strip lines and squeeze blank lines (page breaks are kept)"""
+    pages = []
+    for page in CONTROL_PATTERN.sub('', text).replace('\r\n', '\n').replace('\r', '\n').split(PAGE_BREAK):
+        lines = []
+        for line in page.split('\n'):
+            line = SPACE_PATTERN.sub(' ', line).strip()
+            if line or (lines and lines[-1]):
+                lines.append(line)
+        pages.append('\n'.join(lines).strip())
+    return PAGE_BREAK.join(pages)
+
+
+def repeated_edge_lines(pages):
+    """Lines found at the top or bottom of at least half of the pages (running headers and footers)"""
+    if len(pages) < 2:
+        return set()
+    seen = Counter()
+    for lines in pages:
+        content = [line for line in lines if line]
+        seen.update({line.casefold() for line in content[:EDGE_LINES] + content[-EDGE_LINES:]})
+    return {line for line, count in seen.items() if count >= max(2, (len(pages) + 1) // 2)}
+
+
+def truncate_line(line, budget):
+    """The start of line that fits in budget tokens, cut at a word boundary when there is one nearby"""
+    if budget <= 0:
+        return ''
+    encoding = get_encoding()
+    if encoding is not None:
+        head = encoding.decode(encoding.encode(line, disallowed_special=())[:budget]).rstrip('\ufffd')
+    else:
+        head = line[:budget * CHARS_PER_TOKEN]
+    if len(head) == len(line):
+        return head
+    cut = head.rfind(' ')
+    return head[:cut].rstrip() if cut > len(head) // 2 else head
+
+
+def truncate_to_tokens(text, budget):
+    """Keep lines from the start of text until the token budget is used up.
+
+    The line that doesn't fit is cut rather than dropped: PyPDF2 often returns a whole
+    paragraph or page as one line, and dropping it could leave nothing of the resume.
+    """
+    budget = max(1, budget - count_tokens(TRUNCATION_MARKER) - 1)
+    kept = []
+    used = 0
+    for line in text.split('\n'):
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            kept.append(truncate_line(line, budget - used - 1))
+            break
+        kept.append(line)
+        used += cost
+    head = '\n'.join(kept).rstrip()
+    if not head and text.strip():
+        # Never send an empty resume, however small the budget
+        head = truncate_line(text.strip(), 1)
+    return head + '\n' + TRUNCATION_MARKER
+
+
+def compact_resume_text(text, token_budget=None):
+    """Return (compacted text, stats) where stats has tokens_before, tokens_after and truncated.
+
+    token_budget limits the result (None or 0 for no limit).
+    """
+    tokens_before = count_tokens(text)
+    pages = [page.split('\n') for page in normalize_whitespace(text).split(PAGE_BREAK)]
+    boilerplate = repeated_edge_lines(pages)
+
+    lines = []
+    seen = set()
+    for page in pages:
+        for line in page:
+            if not line:
+                if lines and lines[-1]:
+                    lines.append('')
+                continue
+            key = line.casefold()
+            if PAGE_NUMBER_PATTERN.match(line):
+                continue
+            if key in boilerplate:
+                # Keep a running header once, e.g. when it holds the candidate's name
+                if key in seen:
+                    continue
+                seen.add(key)
+            elif key in seen or (lines and lines[-1].casefold() == key):
+                continue
+            elif len(line) >= DEDUPE_MIN_CHARS:
+                # Short lines (job titles, dates) legitimately repeat; long repeated lines are duplicates
+                seen.add(key)
+            lines.append(line)
+    compacted = '\n'.join(lines).strip()
+
+    truncated = False
+    if token_budget and count_tokens(compacted) > token_budget:
+        compacted = truncate_to_tokens(compacted, token_budget)
+        truncated = True
+    return compacted, {'tokens_before': tokens_before, 'tokens_after': count_tokens(compacted), 'truncated': truncated}